@@ -6,6 +6,8 @@ from datetime import datetime
 import datetime, time
 import numpy as np
 import pickle
+import multiprocessing
+from collections import OrderedDict
 
 
 def save_object(obj, filename):
@@ -28,23 +30,14 @@ def plot_timeseries2(path, time, Roadmap, Color="r", range_CP=5):
     Color:      Color of the plot of the time series.
                 Type sting, with matplotlib color"""
 
-    dist = []
     TT = []
-    D = 0
+    nodes_index = Roadmap.find_nodes(path[:, ::-1])
     for i in range(len(path) - 1):
-        nx = (
-            (Roadmap.nodes[:, 0] - path[i, 1]) ** 2
-            + (Roadmap.nodes[:, 1] - path[i, 0]) ** 2
-        ) ** 0.5
-        idx = np.argwhere(nx == nx.min())[0][0]
-        D = D + Functions.haversine(
-            (path[i, 1], path[i, 0]), (path[i + 1, 1], path[i + 1, 0])
-        )
-        dist.append(D)
+        idx = nodes_index[i]
         T = Roadmap.mask[idx]
         TT.append(T)
     TT = np.array(TT)
-    dist = np.array(dist)
+    dist = np.cumsum(find_leg_lengths(Roadmap, nodes_index))
     if Roadmap.repeat == True:
         k = Calc_path.Has_route.find_k_repeat(Calc_path.Has_route, time[0], Roadmap.t)
         plt.plot(dist, (time[:-1] - time[0]) / 3600, color=Color, label="s/t route")
@@ -82,7 +75,25 @@ def plot_timeseries2(path, time, Roadmap, Color="r", range_CP=5):
         plt.legend(loc="best")
 
 
-def HALEM_func(start, stop, t0, vmax, Roadmap, costfunction):
+def HALEM_func(
+    start,
+    stop,
+    t0,
+    vmax,
+    Roadmap,
+    costfunction,
+    heuristic=None,
+    corridor=None,
+    buffer=None,
+    bound=None,
+    statistics=None,
+    speed_transitions=None,
+    speed=None,
+    return_result=False,
+    exclusion_zones=None,
+    draft=None,
+    ukc=None,
+):
     """ Base of the oe lne functions halem.Base_functions.HALEM_time,
     halem.Base_functions.HALEM_cost, halem.Base_functions.HALEM_space, 
     halem.Base_functions.HALEM_co2. This function takes the pre-processing 
@@ -107,55 +118,619 @@ def HALEM_func(start, stop, t0, vmax, Roadmap, costfunction):
                     Roadmap.weight_space returns shortest route
                     Roadmap.weight_cost returns cheapest route
                     Roadmap.weight_co2 retruns least pollutant route
+    heuristic       None for a Dijkstra search, 'geodesic' for an A* search with the great
+                    circle distance to the destination as lower bound (only for
+                    the time and space optimization), 'landmarks' for an A* search with
+                    the ALT lower bound of Roadmap.landmarks (only for the time optimization)
+    corridor        None, or the ratio of the ellipse around the start and destination
+                    to which the search is limited (sum of the distances to the start
+                    and the destination at most corridor times their distance)
+    buffer          None, or the distance in meters around the straight line between
+                    the start and the destination to which the search is limited
+    bound           None, or an upper bound of the costfunction of the route, for
+                    example a maximum sailing time in seconds for the fastest route.
+                    A ValueError is raised if there is no route within the bound.
+    statistics      None, or a halem.Calc_path.Search_statistics object to which the
+                    counters and timings of the search are added
+    speed_transitions   None for the speed transitions of the Roadmap, or 'adjacent' to
+                    only allow changes to the next higher or lower sailing velocity
+    speed           None, or the index of the sailing velocity (column of vmax) of a route
+                    with a fixed sailing velocity
+    return_result   True to return a halem.Base_functions.Route_result with the coordinates,
+                    distances, times, sailing velocities, costs, and emissions of the route
+                    instead of (path, time, dist)
+    exclusion_zones None, or a list of halem.Calc_path.Exclusion_zone objects with the areas
+                    that are closed for the route
+    draft           None, or the draft of the vessel in meters if it differs from the draft
+                    of the vessel class (Roadmap.WD_min). The weights of the edges on which
+                    the water depth can be limiting are evaluated during the search
+                    (see halem.Mesh_maker.Loading_condition), the other weights are the
+                    weights of the vessel class. Only for the built-in costfunctions of
+                    a Roadmap with the default cost functions.
+    ukc             None, or the under keel clearance in meters if it differs from Roadmap.ukc
     """
 
     start = start[::-1]
     stop = stop[::-1]
 
+    graph_functions_time = find_graph_functions(
+        vmax, Roadmap, costfunction, speed_transitions, speed, draft, ukc
+    )
+
+    route = Calc_path.Has_route(
+        start,
+        stop,
+        Roadmap,
+        t0,
+        graph_functions_time,
+        heuristic=heuristic,
+        corridor=corridor,
+        buffer=buffer,
+        bound=bound,
+        statistics=statistics,
+        exclusion_zones=exclusion_zones,
+    )
+    if statistics is not None:
+        clock = time.perf_counter()
+    if return_result == True:
+        output = Route_result(route.route, Roadmap, graph_functions_time)
+    else:
+        output = route_to_path(route.route, Roadmap)
+    if statistics is not None:
+        statistics.time_reconstruction += time.perf_counter() - clock
+    return output
+
+
+def find_graph_functions(
+    vmax,
+    Roadmap,
+    costfunction,
+    speed_transitions=None,
+    speed=None,
+    draft=None,
+    ukc=None,
+):
+    """Returns the class that selects the weights of the vessel class with the deep water
+    sailing velocity closest to vmax, and of the costfunction, from the Roadmap. The edges
+    are restricted to the speed_transitions and the fixed speed index. With a draft or
+    ukc the weights are the lazy weights of the loading condition
+    (halem.Mesh_maker.Loading_condition). (see halem.Base_functions.HALEM_func())"""
     vvmax = Roadmap.vship[:, -1]
     vv = np.abs(vvmax - vmax)
     arg_vship = int(np.argwhere(vv == vv.min())[0])
 
+    objectives = {
+        "time": Roadmap.weight_time,
+        "space": Roadmap.weight_space,
+        "cost": Roadmap.weight_cost,
+        "co2": Roadmap.weight_co2,
+    }
+    objective_type = None
+    for key in objectives:
+        if objectives[key] is costfunction:
+            objective_type = key
+
     class graph_functions_time:
         weights = costfunction[arg_vship].weights
         time = Roadmap.weight_time[arg_vship].weights
+        edges = costfunction[arg_vship].restricted_edges(speed_transitions, speed)
         vship = Roadmap.vship[arg_vship]
+        vessel_class = arg_vship
+        objective = objective_type
 
-    route = Calc_path.Has_route(start, stop, Roadmap, t0, graph_functions_time)
-    path = Roadmap.nodes[np.array(route.route[:, 0], dtype=int)]
-    time = route.route[:, 1]
+    graph_functions_time.speed_transitions = speed_transitions
+    graph_functions_time.speed = speed
+    graph_functions_time.loading = None
 
-    dist = []
-    D = 0
-    for i in range(route.route[:, 0].shape[0] - 1):
-        D = D + Functions.haversine(
-            (route.y_route[i], route.x_route[i]),
-            (route.y_route[i + 1], route.x_route[i + 1]),
-        )
-        dist.append(D)
-    dist = np.array(dist)
+    if draft != None or ukc != None:
+        if objective_type == None:
+            raise ValueError(
+                "A draft or ukc can only be given for the costfunctions of the Roadmap"
+            )
+        loading = Roadmap.find_loading(arg_vship, draft, ukc)
+        graph_functions_time.loading = loading
+        graph_functions_time.weights = getattr(loading, "weight_" + objective_type)
+        graph_functions_time.time = loading.weight_time
+
+    return graph_functions_time
+
+
+def route_to_path(route, Roadmap):
+    """Returns the (lon, lat) coordinates, the times, and the sailed distance of a route
+    in the format of halem.Calc_path.Has_route.route"""
+    nodes = np.array(route[:, 0], dtype=int)
+    path = Roadmap.nodes[nodes]
+    time = route[:, 1]
+    dist = np.cumsum(find_leg_lengths(Roadmap, nodes))
     return path[:, ::-1], time, dist
 
 
-def HALEM_time(start, stop, t0, vmax, Roadmap):
+def find_leg_lengths(Roadmap, nodes):
+    """Returns the lengths in meters of the legs between the consecutive nodes (indices of
+    Roadmap.nodes), from Roadmap.edge_length if the legs are edges of the Roadmap."""
+    nodes = [int(node) for node in nodes]
+    legs = list(zip(nodes[:-1], nodes[1:]))
+    edge_length = getattr(Roadmap, "edge_length", {})
+    if all(leg in edge_length for leg in legs):
+        return np.array([edge_length[leg] for leg in legs], dtype=float)
+    return Functions.haversine_array(
+        Roadmap.nodes[nodes[:-1]], Roadmap.nodes[nodes[1:]]
+    )
+
+
+class Route_result:
+    """Structured result of a route (see halem.Base_functions.HALEM_func()), all values
+    are computed at once from the (node, time, weight, speed) rows of the route.
+
+    path:       (lon, lat) coordinates of the nodes of the route, shape (N, 2)
+    time:       timestamps at the nodes of the route, shape (N,)
+    dist:       sailed distance in meters at the nodes of the route, shape (N,)
+    leg_time:   sailing time in seconds of the legs between the nodes, shape (N - 1,)
+    speed:      index of the sailing velocity on the legs (column of Roadmap.vship)
+    vship:      sailing velocity in deep water on the legs in m/s
+    weight:     value of the costfunction of the route at the nodes
+    cost:       costs at the nodes, None if the Roadmap has no cost weights
+    co2:        emissions at the nodes, None if the Roadmap has no co2 weights
+    """
+
+    def __init__(self, route, Roadmap, graph_functions):
+        nodes = np.array(route[:, 0], dtype=int)
+        states = list(zip(nodes, np.array(route[:, 3], dtype=int)))
+        legs = list(zip(states[:-1], states[1:]))
+        coordinates = Roadmap.nodes[nodes]
+        vessel_class = graph_functions.vessel_class
+
+        self.path = coordinates[:, ::-1]
+        self.time = route[:, 1]
+        self.dist = np.concatenate([[0], np.cumsum(find_leg_lengths(Roadmap, nodes))])
+        self.leg_time = np.diff(self.time)
+        self.speed = np.array(route[1:, 3], dtype=int)
+        self.vship = Roadmap.vship[vessel_class][self.speed]
+        self.weight = route[:, 2]
+
+        time_axis = Calc_path.Has_route.find_time_axis(Calc_path.Has_route, Roadmap)
+        k = time_axis.find_k_array(self.time[:-1])
+        loading = getattr(graph_functions, "loading", None)
+        if loading != None:
+            cost, co2 = loading.weight_cost, loading.weight_co2
+        else:
+            cost = self.find_weights(Roadmap.weight_cost, vessel_class)
+            co2 = self.find_weights(Roadmap.weight_co2, vessel_class)
+        self.cost = self.accumulate(cost, legs, k)
+        self.co2 = self.accumulate(co2, legs, k)
+
+    def find_weights(self, costfunction, vessel_class):
+        """Returns the weights of the vessel class of the costfunction, or None if the
+        Roadmap has no weights for the costfunction."""
+        if len(costfunction) <= vessel_class:
+            return None
+        return costfunction[vessel_class].weights
+
+    def accumulate(self, weights, legs, k):
+        """Returns the cumulative weights along the legs departing at the time steps k,
+        or None if weights is None."""
+        if weights is None:
+            return None
+        values = np.array([weights[leg][kk] for leg, kk in zip(legs, k)], dtype=float)
+        return np.concatenate([[0], np.cumsum(values)])
+
+
+def HALEM_one_to_many(
+    start, stops, t0, vmax, Roadmap, costfunction, return_paths=False
+):
+    """ Optimal routes from one start location to multiple destinations, with a single
+    search from the start location that stops when all destinations are reached.
+    The routes are the same as the routes of halem.Base_functions.HALEM_func().
+
+    start:          (lon, lat) coordinates of the start location
+    stops:          numpy array with the (lon, lat) coordinates of the destinations, shape (M, 2)
+    t0, vmax, Roadmap, costfunction:    see halem.Base_functions.HALEM_func()
+    return_paths:   True to also return the routes to the destinations
+
+    returns the arrival times (timestamps) and the values of the costfunction for every
+    destination as numpy arrays with shape (M,), np.inf for a destination that can not
+    be reached. With return_paths a list with for every destination the output of
+    halem.Base_functions.HALEM_func() (path, time, dist), or None, is returned as well.
+    """
+    graph_functions_time = find_graph_functions(vmax, Roadmap, costfunction)
+    routes = Calc_path.Has_routes(
+        np.asarray(start)[::-1],
+        np.atleast_2d(stops)[:, ::-1],
+        Roadmap,
+        t0,
+        graph_functions_time,
+    )
+
+    if return_paths == True:
+        paths = [
+            None if route is None else route_to_path(route, Roadmap)
+            for route in routes.routes
+        ]
+        return routes.sailing_time, routes.weight, paths
+    return routes.sailing_time, routes.weight
+
+
+def HALEM_many_to_many(
+    starts, stops, t0, vmax, Roadmap, costfunction, return_paths=False
+):
+    """ Optimal routes between all start locations and all destinations, with one search
+    for every start location (see halem.Base_functions.HALEM_one_to_many()).
+
+    starts:         numpy array with the (lon, lat) coordinates of the start locations, shape (N, 2)
+    stops:          numpy array with the (lon, lat) coordinates of the destinations, shape (M, 2)
+
+    returns the arrival times and the values of the costfunction as numpy arrays with
+    shape (N, M). With return_paths the routes are returned as well, as a list of N lists
+    with M routes.
+    """
+    starts = np.atleast_2d(starts)
+    stops = np.atleast_2d(stops)
+    times = np.full((len(starts), len(stops)), np.inf)
+    costs = np.full((len(starts), len(stops)), np.inf)
+    paths = []
+    for i, start in enumerate(starts):
+        output = HALEM_one_to_many(
+            start, stops, t0, vmax, Roadmap, costfunction, return_paths
+        )
+        times[i] = output[0]
+        costs[i] = output[1]
+        if return_paths == True:
+            paths.append(output[2])
+
+    if return_paths == True:
+        return times, costs, paths
+    return times, costs
+
+
+def HALEM_profile(start, stop, t_start, t_end, vmax, Roadmap):
+    """ Earliest arrival time at the destination as a function of the departure time,
+    for all time steps of the Roadmap between t_start and t_end. The arrival times are
+    computed in one profile search (halem.Calc_path.Has_profile) and are the same as
+    the arrival times of halem.Base_functions.HALEM_time() for every departure time.
+
+    start:          (lon, lat) coordinates of the start location
+    stop:           (lon, lat) coordinates of the destination location
+    t_start:        string that indcates the first departure time
+                    ('day'/'month'/'year' 'hour':'minute':'seconds')
+    t_end:          string that indcates the last departure time
+    vmax, Roadmap:  see halem.Base_functions.HALEM_func()
+
+    returns the departure times and the arrival times (timestamps) as numpy arrays,
+    np.inf for a departure time without a route. The arrays are empty if there is no
+    time step of the Roadmap between t_start and t_end.
+    """
+    t_start = datetime.datetime.strptime(t_start, "%d/%m/%Y %H:%M:%S").timestamp()
+    t_end = datetime.datetime.strptime(t_end, "%d/%m/%Y %H:%M:%S").timestamp()
+    departures = Roadmap.t[(Roadmap.t >= t_start) & (Roadmap.t <= t_end)]
+
+    graph_functions_time = find_graph_functions(vmax, Roadmap, Roadmap.weight_time)
+    profile = Calc_path.Has_profile(
+        start[::-1], stop[::-1], Roadmap, departures, graph_functions_time
+    )
+    return profile.departures, profile.arrivals
+
+
+def HALEM_pareto(
+    start,
+    stop,
+    t0,
+    vmax,
+    Roadmap,
+    objectives=["time", "co2"],
+    max_routes=None,
+    epsilon=0.01,
+):
+    """ Pareto optimal routes for multiple objectives, calculated in a single multi criteria
+    search (halem.Calc_path.Has_pareto_routes). None of the routes is better than another
+    route for all objectives.
+
+    start, stop, t0, vmax, Roadmap:     see halem.Base_functions.HALEM_func()
+    objectives:     list with the optimization types of the objectives,
+                    'time', 'space', 'cost', or 'co2'
+    max_routes:     None, or the maximum number of routes. The routes are found in the
+                    order of the first objective, the search stops when max_routes
+                    routes are found.
+    epsilon:        relative tolerance of the dominance of the labels, 0.01 gives a front
+                    of routes that differ at least 1% in one of the objectives. 0 gives the
+                    exact Pareto front, which can have hundreds of routes on a Roadmap with
+                    time dependent weights and take much longer.
+
+    returns a numpy array with the values of the objectives of every route, shape
+    (number of routes, number of objectives), sorted on the first objective, and a list
+    with the output of halem.Base_functions.HALEM_func() (path, time, dist) for every route.
+    """
+    graph_functions_time = find_graph_functions(vmax, Roadmap, Roadmap.weight_time)
+    vessel_class = graph_functions_time.vessel_class
+    weights = [
+        getattr(Roadmap, "weight_" + objective)[vessel_class].weights
+        for objective in objectives
+    ]
+
+    routes = Calc_path.Has_pareto_routes(
+        start[::-1],
+        stop[::-1],
+        Roadmap,
+        t0,
+        graph_functions_time,
+        weights,
+        max_routes,
+        epsilon,
+    )
+    paths = [route_to_path(np.array(route), Roadmap) for route in routes.routes]
+    return routes.values, paths
+
+
+class Route_cache:
+    """ Bounded LRU cache of routes around halem.Base_functions.HALEM_func() for one Roadmap.
+
+    The routes are stored on the snapped start and stop node, the vessel class, the
+    costfunction, the other arguments of HALEM_func, and the time step of the Roadmap
+    nearest to the departure time. A departure time in the same time step gives a
+    cache hit, the cached sequence of nodes and sailing velocities is then sailed again
+    from the new departure time, so the times and costs of the route are exact for the
+    new departure time. If the route sailed again does not depart every leg in the same
+    time step as the cached route, or does not reach the destination, the route is
+    searched again (a miss) and replaces the cached route. A hit is the optimal route of
+    the cached departure time, another route can be faster for the new departure time
+    on a Roadmap with time dependent weights. The cache is cleared when Roadmap.version
+    changes.
+
+    Roadmap:    Roadmap of the routes (output of halem.Mesh_maker.Graph_flow_model)
+    maxsize:    maximum number of cached routes, the least recently used route is
+                removed first
+    """
+
+    def __init__(self, Roadmap, maxsize=1024):
+        self.Roadmap = Roadmap
+        self.maxsize = maxsize
+        self.routes = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.version = getattr(Roadmap, "version", 0)
+
+    def clear(self):
+        """Removes all cached routes and resets the statistics."""
+        self.routes.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def info(self):
+        """Returns a dict with the number of hits, misses, and cached routes."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "maxsize": self.maxsize,
+            "size": len(self.routes),
+        }
+
+    def HALEM_func(self, start, stop, t0, vmax, costfunction, **kwargs):
+        """Cached version of halem.Base_functions.HALEM_func() for the Roadmap of the cache."""
+        Roadmap = self.Roadmap
+        return_result = kwargs.pop("return_result", False)
+        statistics = kwargs.pop("statistics", None)
+        speed_transitions = kwargs.pop("speed_transitions", None)
+        speed = kwargs.pop("speed", None)
+        draft = kwargs.pop("draft", None)
+        ukc = kwargs.pop("ukc", None)
+        version = getattr(Roadmap, "version", 0)
+        if version != self.version:
+            self.routes.clear()
+            self.version = version
+
+        graph_functions_time = find_graph_functions(
+            vmax, Roadmap, costfunction, speed_transitions, speed, draft, ukc
+        )
+        start_node, stop_node = Roadmap.find_nodes(np.array([start[::-1], stop[::-1]]))
+        t = datetime.datetime.strptime(t0, "%d/%m/%Y %H:%M:%S").timestamp()
+        time_axis = Calc_path.Has_route.find_time_axis(Calc_path.Has_route, Roadmap)
+        k = time_axis.find_k(t)
+        key = (
+            start_node,
+            stop_node,
+            graph_functions_time.vessel_class,
+            graph_functions_time.objective,
+            k,
+            speed_transitions,
+            speed,
+            draft,
+            ukc,
+            tuple(
+                (name, tuple(value) if isinstance(value, list) else value)
+                for name, value in sorted(kwargs.items())
+            ),
+        )
+
+        route = None
+        if key in self.routes:
+            states, steps = self.routes[key]
+            route = np.array(
+                Calc_path.Has_route.evaluate_route(
+                    Calc_path.Has_route, Roadmap, states, t, graph_functions_time
+                )
+            )
+            if not np.isfinite(route[-1, 1]) or (
+                time_axis.find_k_array(route[:-1, 1]).tolist() != steps
+            ):
+                route = None
+        if route is None:
+            self.misses += 1
+            route = Calc_path.Has_route(
+                start[::-1],
+                stop[::-1],
+                Roadmap,
+                t0,
+                graph_functions_time,
+                statistics=statistics,
+                **kwargs
+            ).route
+            states = [(int(node), int(speed)) for node, speed in route[:, [0, 3]]]
+            steps = time_axis.find_k_array(route[:-1, 1]).tolist()
+            self.routes[key] = (states, steps)
+            self.routes.move_to_end(key)
+            if len(self.routes) > self.maxsize:
+                self.routes.popitem(last=False)
+        else:
+            self.hits += 1
+            self.routes.move_to_end(key)
+
+        if return_result == True:
+            return Route_result(route, Roadmap, graph_functions_time)
+        return route_to_path(route, Roadmap)
+
+    def HALEM_time(self, start, stop, t0, vmax, **kwargs):
+        """Cached version of halem.Base_functions.HALEM_time()."""
+        return self.HALEM_func(
+            start, stop, t0, vmax, self.Roadmap.weight_time, **kwargs
+        )
+
+    def HALEM_space(self, start, stop, t0, vmax, **kwargs):
+        """Cached version of halem.Base_functions.HALEM_space()."""
+        return self.HALEM_func(
+            start, stop, t0, vmax, self.Roadmap.weight_space, **kwargs
+        )
+
+    def HALEM_cost(self, start, stop, t0, vmax, **kwargs):
+        """Cached version of halem.Base_functions.HALEM_cost()."""
+        return self.HALEM_func(
+            start, stop, t0, vmax, self.Roadmap.weight_cost, **kwargs
+        )
+
+    def HALEM_co2(self, start, stop, t0, vmax, **kwargs):
+        """Cached version of halem.Base_functions.HALEM_co2()."""
+        return self.HALEM_func(start, stop, t0, vmax, self.Roadmap.weight_co2, **kwargs)
+
+
+batch_roadmap = None
+
+
+def batch_initializer(Roadmap):
+    """Stores the Roadmap in a worker process of halem.Base_functions.HALEM_batch()."""
+    global batch_roadmap
+    batch_roadmap = Roadmap
+
+
+def batch_route(query, Roadmap=None):
+    """Route of one query of halem.Base_functions.HALEM_batch(), None without a route.
+    With statistics the route is returned together with the Search_statistics of the query.
+    The Roadmap is the Roadmap of the worker process if Roadmap is None."""
+    if Roadmap is None:
+        Roadmap = batch_roadmap
+    start, stop, t0, vmax, objective, statistics, kwargs = query
+    costfunction = getattr(Roadmap, "weight_" + objective)
+    statistics = Calc_path.Search_statistics() if statistics == True else None
+    try:
+        route = HALEM_func(
+            start,
+            stop,
+            t0,
+            vmax,
+            Roadmap,
+            costfunction,
+            statistics=statistics,
+            **kwargs
+        )
+    except Calc_path.No_route_found:
+        route = None
+    return route if statistics is None else (route, statistics)
+
+
+def HALEM_batch(
+    starts,
+    stops,
+    t0,
+    vmax,
+    Roadmap,
+    costfunction,
+    processes=None,
+    chunksize=16,
+    statistics=None,
+    **kwargs
+):
+    """ Optimal routes for a batch of queries, computed in parallel by a pool of worker
+    processes. Where the operating system can fork, the workers share the memory of
+    the Roadmap of the main process, otherwise the Roadmap is sent once to every worker.
+    The routes are returned in the order of the queries, as soon as they are available.
+
+    starts:         numpy array with the (lon, lat) coordinates of the start locations, shape (N, 2)
+    stops:          numpy array with the (lon, lat) coordinates of the destinations, shape (N, 2)
+    t0:             departure time (see halem.Base_functions.HALEM_func()), or a list
+                    with a departure time for every query
+    vmax:           sailing velocity, or a numpy array with a sailing velocity for every query
+    Roadmap, costfunction:  see halem.Base_functions.HALEM_func()
+    processes:      number of worker processes, None for the number of CPUs. With one
+                    process the routes are computed in the main process.
+    chunksize:      number of queries that is sent to a worker at once
+    statistics:     None, or a halem.Calc_path.Search_statistics object to which the
+                    counters and timings of all searches of the batch are added
+    kwargs:         other arguments of halem.Base_functions.HALEM_func()
+
+    yields for every query the output of halem.Base_functions.HALEM_func()
+    (path, time, dist), or None if there is no route. Other errors of a query, such as
+    invalid arguments, are raised.
+    """
+    objective = None
+    for key in ["time", "space", "cost", "co2"]:
+        if getattr(Roadmap, "weight_" + key) is costfunction:
+            objective = key
+    if objective == None:
+        raise ValueError("The costfunction must be one of the weights of the Roadmap")
+
+    starts = np.atleast_2d(starts)
+    stops = np.atleast_2d(stops)
+    n = len(starts)
+    t0 = [t0] * n if isinstance(t0, str) else t0
+    vmax = np.broadcast_to(vmax, n)
+    queries = (
+        (starts[i], stops[i], t0[i], vmax[i], objective, statistics != None, kwargs)
+        for i in range(n)
+    )
+
+    def collect(outputs):
+        for output in outputs:
+            if statistics is not None:
+                output, query_statistics = output
+                statistics.add(query_statistics)
+            yield output
+
+    if processes == 1:
+        yield from collect(batch_route(query, Roadmap) for query in queries)
+        return
+
+    if "fork" in multiprocessing.get_all_start_methods():
+        # The forked workers inherit the Roadmap from the main process
+        context = multiprocessing.get_context("fork")
+        initializer, initargs = None, ()
+        batch_initializer(Roadmap)
+    else:
+        context = multiprocessing.get_context()
+        initializer, initargs = batch_initializer, (Roadmap,)
+    try:
+        pool = context.Pool(processes, initializer, initargs)
+    finally:
+        batch_initializer(None)
+    with pool:
+        yield from collect(pool.imap(batch_route, queries, chunksize))
+
+
+def HALEM_time(start, stop, t0, vmax, Roadmap, **kwargs):
     """Implementation of the function halem.Base_functions.HALEM_func() for the fastest route."""
     costfunction = Roadmap.weight_time
-    return HALEM_func(start, stop, t0, vmax, Roadmap, costfunction)
+    return HALEM_func(start, stop, t0, vmax, Roadmap, costfunction, **kwargs)
 
 
-def HALEM_space(start, stop, t0, vmax, Roadmap):
+def HALEM_space(start, stop, t0, vmax, Roadmap, **kwargs):
     """Implementation of the function halem.Base_functions.HALEM_func() for the shortest route."""
     costfunction = Roadmap.weight_space
-    return HALEM_func(start, stop, t0, vmax, Roadmap, costfunction)
+    return HALEM_func(start, stop, t0, vmax, Roadmap, costfunction, **kwargs)
 
 
-def HALEM_cost(start, stop, t0, vmax, Roadmap):
+def HALEM_cost(start, stop, t0, vmax, Roadmap, **kwargs):
     """Implementation of the function halem.Base_functions.HALEM_func() for the cheapest route."""
     costfunction = Roadmap.weight_cost
-    return HALEM_func(start, stop, t0, vmax, Roadmap, costfunction)
+    return HALEM_func(start, stop, t0, vmax, Roadmap, costfunction, **kwargs)
 
 
-def HALEM_co2(start, stop, t0, vmax, Roadmap):
+def HALEM_co2(start, stop, t0, vmax, Roadmap, **kwargs):
     """Implementation of the function halem.Base_functions.HALEM_func() for the least pollutant route."""
     costfunction = Roadmap.weight_co2
-    return HALEM_func(start, stop, t0, vmax, Roadmap, costfunction)
+    return HALEM_func(start, stop, t0, vmax, Roadmap, costfunction, **kwargs)
@@ -1,12 +1,140 @@
 import halem.Functions as Functions
+import halem.Mesh_maker as Mesh_maker
 from datetime import datetime
 import datetime, time
 import numpy as np
+import heapq
+import bisect
+import matplotlib.path
 
 # Added for openclsim integration
 import openclsim.core as core
 
 
+class Search_statistics:
+    """Counters and timings of route searches. A Search_statistics object can be given
+    to halem.Calc_path.Has_route (or halem.Base_functions.HALEM_func()) for every query,
+    the counters of all queries are added up. Statistics of different batches can be
+    combined with Search_statistics.add().
+
+    queries:                number of route queries
+    settled:                number of settled (node, speed) states
+    relaxed:                number of relaxed arcs
+    heap_pushes:            number of pushes on the heap of the search
+    heap_pops:              number of pops from the heap of the search
+    time_lookups:           number of lookups of the time step of the weights
+    time_snapping:          time in seconds spent on finding the start and stop nodes
+    time_search:            time in seconds spent in the search
+    time_reconstruction:    time in seconds spent on the reconstruction of the path
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.settled = 0
+        self.relaxed = 0
+        self.heap_pushes = 0
+        self.heap_pops = 0
+        self.time_lookups = 0
+        self.time_snapping = 0.0
+        self.time_search = 0.0
+        self.time_reconstruction = 0.0
+
+    def add(self, other):
+        """Adds the counters and timings of another Search_statistics object."""
+        for key, value in vars(other).items():
+            setattr(self, key, getattr(self, key) + value)
+        return self
+
+    def as_dict(self):
+        """Returns the counters and timings as a dict."""
+        return dict(vars(self))
+
+    def __repr__(self):
+        return "Search_statistics({})".format(
+            ", ".join("{}={}".format(key, value) for key, value in vars(self).items())
+        )
+
+
+class No_route_found(ValueError):
+    """Raised if there is no route from the start to the destination. It is a ValueError,
+    so that it is separated from the other errors of the route searches, such as invalid
+    arguments."""
+
+
+class Exclusion_zone:
+    """Area that is closed for shipping, for example a dredging area or a construction
+    site, that is applied at query time without rebuilding the Roadmap. The arcs of the
+    Roadmap with a node or the midpoint inside the polygon are closed. With a time window
+    the arcs are only closed for vessels that sail the arc during the window.
+
+    polygon:    numpy array with the (lon, lat) coordinates of the corners of the area
+    t_start:    None, or the start of the closure ('day'/'month'/'year' 'hour':'minute':'seconds')
+    t_end:      None, or the end of the closure ('day'/'month'/'year' 'hour':'minute':'seconds')
+    """
+
+    def __init__(self, polygon, t_start=None, t_end=None):
+        self.polygon = np.asarray(polygon, dtype=float)
+        self.path = matplotlib.path.Path(self.polygon[:, ::-1])
+        self.t_start = -np.inf if t_start == None else self.timestamp(t_start)
+        self.t_end = np.inf if t_end == None else self.timestamp(t_end)
+        self.edges = {}
+
+    def timestamp(self, t):
+        return datetime.datetime.strptime(t, "%d/%m/%Y %H:%M:%S").timestamp()
+
+    def find_edges(self, Roadmap):
+        """Returns the set of closed (from_node, to_node) edges of the Roadmap. The set is
+        stored in the zone for the next queries, until Roadmap.version changes."""
+        key = (id(Roadmap), getattr(Roadmap, "version", 0))
+        if key not in self.edges:
+            self.edges = {key: self.closed_edges(Roadmap)}
+        return self.edges[key]
+
+    def closed_edges(self, Roadmap):
+        """Returns the set of (from_node, to_node) edges of the Roadmap with a node or the
+        midpoint inside the polygon. Only the points inside the bounding box of the
+        polygon are tested."""
+        edge_length = getattr(Roadmap, "edge_length", None)
+        if edge_length == None:
+            edge_length = set((a[0], b[0]) for a, b in Roadmap.graph.weights)
+        edges = np.array(list(edge_length), dtype=int).reshape(-1, 2)
+
+        nodes = Roadmap.nodes
+        points = np.concatenate(
+            [nodes, (nodes[edges[:, 0]] + nodes[edges[:, 1]]) / 2], axis=0
+        )
+        low = self.polygon[:, ::-1].min(axis=0)
+        high = self.polygon[:, ::-1].max(axis=0)
+        candidates = np.flatnonzero(((points >= low) & (points <= high)).all(axis=1))
+        inside = np.zeros(len(points), dtype=bool)
+        inside[candidates] = self.path.contains_points(points[candidates])
+
+        node_inside = inside[: len(nodes)]
+        closed = (
+            node_inside[edges[:, 0]] | node_inside[edges[:, 1]] | inside[len(nodes) :]
+        )
+        return set(map(tuple, edges[closed].tolist()))
+
+
+class Node_values(dict):
+    """Values of the Roadmap nodes for a search, for example the lower bounds of the
+    heuristic or the nodes inside the corridor, indexed by the node index. The value of
+    a node is computed at the first lookup, so that a search only evaluates the nodes
+    that it reaches instead of all nodes of the Roadmap.
+
+    function:   function that returns the value of a node index
+    """
+
+    def __init__(self, function):
+        super().__init__()
+        self.function = function
+
+    def __missing__(self, node):
+        value = self.function(node)
+        self[node] = value
+        return value
+
+
 class Has_route:
     """ This class contains the code for calculating the optimal route from the pre-proccessed Roadmap
 
@@ -14,87 +142,474 @@ class Has_route:
     stop:               destination location (lat, lon)
     Roadmap:            Preprocessing file
     graph_functions:    class that selects the correct weights from the Roadmap.
+    heuristic:          None for a Dijkstra search, or 'geodesic' for an A* search that uses the
+                        great circle distance to the destination as lower bound. The geodesic
+                        lower bound is available for the time and space optimization.
+                        'landmarks' gives an A* search with the ALT lower bound of the time
+                        optimization, this needs the landmark preprocessing of the Roadmap
+                        (Roadmap.compute_landmarks()).
+    corridor:           None, or the ratio of an ellipse around the start and the destination
+                        to which the search is limited: only the nodes for which the sum of
+                        the great circle distances to the start and the destination is at most
+                        corridor times the distance between the start and the destination.
+    buffer:             None, or the distance in meters around the straight line between the
+                        start and the destination to which the search is limited.
+    bound:              None, or an upper bound of the weight of the route. States with a
+                        larger weight (plus lower bound of the heuristic) are not labelled.
+    statistics:         None, or a halem.Calc_path.Search_statistics object to which the
+                        counters and timings of the search are added.
+    exclusion_zones:    None, or a list of halem.Calc_path.Exclusion_zone objects with
+                        the areas that the route may not cross.
     """
 
-    def __init__(self, start, stop, Roadmap, t0, graph_functions):
+    def __init__(
+        self,
+        start,
+        stop,
+        Roadmap,
+        t0,
+        graph_functions,
+        heuristic=None,
+        corridor=None,
+        buffer=None,
+        bound=None,
+        statistics=None,
+        exclusion_zones=None,
+    ):
         d = datetime.datetime.strptime(t0, "%d/%m/%Y %H:%M:%S")
         t0 = d.timestamp()
 
-        start = self.find_startstop(start, Roadmap.nodes)
-        stop = self.find_startstop(stop, Roadmap.nodes)
+        if statistics is not None:
+            statistics.queries += 1
+            clock = time.perf_counter()
+        start, stop = Roadmap.find_nodes(np.array([start, stop]))
+        if statistics is not None:
+            statistics.time_snapping += time.perf_counter() - clock
+
+        speed = self.find_speed(graph_functions)
+        self.start = (start, speed)
+        self.stop = (stop, speed)
 
-        self.start = (start, 0)
-        self.stop = (stop, 0)
+        if not self.feasible(Roadmap, start, stop, t0, graph_functions):
+            raise No_route_found(
+                "No route found from node {} to node {}".format(start, stop)
+            )
+        if getattr(graph_functions, "loading", None) != None:
+            if heuristic == "landmarks":
+                raise ValueError(
+                    "The landmarks are made for the vessel classes of the Roadmap"
+                )
 
+        if heuristic == None:
+            lower_bound = None
+        elif heuristic == "geodesic":
+            lower_bound = self.lower_bound_geodesic(Roadmap, stop, graph_functions)
+        elif heuristic == "landmarks":
+            lower_bound = self.lower_bound_landmarks(Roadmap, stop, graph_functions)
+        else:
+            raise ValueError("Unknown heuristic: {}".format(heuristic))
+
+        allowed = self.corridor_nodes(Roadmap, start, stop, corridor, buffer)
+        closed = self.closed_edges(Roadmap, exclusion_zones)
         self.route = np.array(
-            self.dijsktra(Roadmap, self.start, self.stop, t0, graph_functions)
+            self.dijsktra(
+                Roadmap,
+                self.start,
+                self.stop,
+                t0,
+                graph_functions,
+                lower_bound,
+                allowed,
+                bound,
+                statistics,
+                closed,
+            )
         )
 
-        self.x_route = np.zeros(len(self.route[:, 0]))
-        self.y_route = np.zeros(len(self.x_route))
+        if statistics is not None:
+            clock = time.perf_counter()
+        route_nodes = Roadmap.nodes[np.array(self.route[:, 0], dtype=int)]
+        self.x_route = route_nodes[:, 1]
+        self.y_route = route_nodes[:, 0]
         self.t_route = self.route[:, 1]
-        for i in range(len(self.x_route)):
-            self.x_route[i] = Roadmap.nodes[int(self.route[i, 0])][1]
-            self.y_route[i] = Roadmap.nodes[int(self.route[i, 0])][0]
 
         self.sailing_time = self.t_route[-1]
+        if statistics is not None:
+            statistics.time_reconstruction += time.perf_counter() - clock
 
-    def dijsktra(self, Roadmap, initial, end, t0, graph_functions):  # Typefout
-
-        shortest_paths = {initial: (None, 0)}
-        time_paths = {initial: (None, t0)}
-        current_node = initial
-        visited = set()
-        find_k = self.find_k_time if Roadmap.repeat == False else self.find_k_repeat
-
-        while current_node != end:
-            visited.add(current_node)
-            destinations = Roadmap.graph.edges[current_node]
-            weight_to_current_node = shortest_paths[current_node][1]
-            time_to_current_node = time_paths[current_node][1]
-
-            for next_node in destinations:
-                k = find_k(time_to_current_node, Roadmap.t)
-                weight = (
-                    weight_to_current_node
-                    + graph_functions.weights[(current_node, next_node)][k]
+    def dijsktra(
+        self,
+        Roadmap,
+        initial,
+        end,
+        t0,
+        graph_functions,
+        lower_bound=None,
+        allowed=None,
+        bound=None,
+        statistics=None,
+        closed=None,
+    ):  # Typefout
+        """Time dependent Dijkstra over the (node, speed) states of the Roadmap.
+
+        The labels are stored in flat lists that are indexed by the integer state id
+        node * number of speeds + speed. The next state is popped from a binary heap,
+        outdated heap entries are skipped when they are popped (lazy deletion).
+        Ties are broken on the order in which the states are labelled for the first
+        time, this gives the same routes as a linear search over all labelled states.
+
+        lower_bound:    None, or array or halem.Calc_path.Node_values with for every node
+                        a lower bound of the remaining weight to the destination. With a
+                        lower bound the search is an A* search.
+        allowed:        None, or boolean array or halem.Calc_path.Node_values with the
+                        nodes that the search may visit.
+        bound:          None, or an upper bound of the weight to the destination, states
+                        with a larger weight plus lower bound are not labelled.
+        statistics:     None, or a Search_statistics object for the counters and timings.
+        closed:         None, or a list of (edges, t_start, t_end) tuples with sets of closed
+                        (from_node, to_node) edges, see Has_route.closed_edges().
+        """
+        if statistics is not None:
+            clock = time.perf_counter()
+        labels = self.search(
+            Roadmap,
+            initial,
+            [end],
+            t0,
+            graph_functions,
+            lower_bound,
+            allowed,
+            bound,
+            statistics,
+            closed,
+        )
+        if statistics is not None:
+            statistics.time_search += time.perf_counter() - clock
+            clock = time.perf_counter()
+        path = self.find_path(Roadmap, labels, end)
+        if statistics is not None:
+            statistics.time_reconstruction += time.perf_counter() - clock
+        if path == None:
+            raise No_route_found(
+                "No route found from node {} to node {}".format(initial[0], end[0])
+            )
+        return path
+
+    def search(
+        self,
+        Roadmap,
+        initial,
+        ends,
+        t0,
+        graph_functions,
+        lower_bound=None,
+        allowed=None,
+        bound=None,
+        statistics=None,
+        closed=None,
+    ):
+        """Time dependent search from the initial state that stops when all states in
+        ends are settled (see Has_route.dijsktra()). Returns the labels of the search
+        as a tuple (weight_label, time_label, previous, order), which are dicts indexed
+        by the state id of the labelled states. The initial state has previous -1. Arcs with an infinite weight
+        at the time step of the departure are not sailed. The counters of the search are
+        added to statistics (Search_statistics) if it is not None.
+        """
+        n_speeds = len(Roadmap.vship[0])
+
+        # The labels only hold the states that the search reaches
+        weight_label = {}
+        time_label = {}
+        previous = {}
+        order = {}
+        settled = set()
+
+        edges = self.find_edges(Roadmap, graph_functions)
+        weights = graph_functions.weights
+        times = graph_functions.time
+        find_k = self.find_time_axis(Roadmap).find_k
+
+        if lower_bound is None:
+            lower_bound = Node_values(lambda node: 0)
+        bound = np.inf if bound == None else bound
+
+        initial_id = initial[0] * n_speeds + initial[1]
+        end_ids = set(end[0] * n_speeds + end[1] for end in ends)
+
+        weight_label[initial_id] = 0
+        time_label[initial_id] = t0
+        previous[initial_id] = -1
+        order[initial_id] = 0
+        labelled = 1
+        heap = [(0, 0, initial_id)]
+        pops = 0
+
+        while heap:
+            current_id = heapq.heappop(heap)[2]
+            pops += 1
+            if current_id in settled:
+                continue
+            if current_id in end_ids:
+                end_ids.discard(current_id)
+                if not end_ids:
+                    break
+            settled.add(current_id)
+
+            current_node = (current_id // n_speeds, current_id % n_speeds)
+            weight_to_current_node = weight_label[current_id]
+            time_to_current_node = time_label[current_id]
+            k = find_k(time_to_current_node)
+
+            for next_node in edges.get(current_node, ()):
+                next_id = next_node[0] * n_speeds + next_node[1]
+                if next_id in settled:
+                    continue
+                if allowed is not None and not allowed[next_node[0]]:
+                    continue
+                weight = weight_to_current_node + weights[(current_node, next_node)][k]
+                if weight == np.inf:
+                    # The arc is not navigable at this time step
+                    continue
+                if weight + lower_bound[next_node[0]] > bound:
+                    continue
+                if closed is not None and self.arc_closed(
+                    closed,
+                    (current_node[0], next_node[0]),
+                    time_to_current_node,
+                    time_to_current_node + times[(current_node, next_node)][k],
+                ):
+                    continue
+
+                if next_id not in order:
+                    order[next_id] = labelled
+                    labelled += 1
+                elif weight_label[next_id] <= weight:
+                    continue
+
+                weight_label[next_id] = weight
+                time_label[next_id] = (
+                    time_to_current_node + times[(current_node, next_node)][k]
                 )
-                time = (
-                    time_to_current_node
-                    + graph_functions.time[(current_node, next_node)][k]
+                previous[next_id] = current_id
+                heapq.heappush(
+                    heap, (weight + lower_bound[next_node[0]], order[next_id], next_id),
                 )
 
-                if next_node not in shortest_paths:
-                    shortest_paths[next_node] = (current_node, weight)
-                    time_paths[next_node] = (current_node, time)
-                else:
-                    current_shortest_weight = shortest_paths[next_node][1]
-                    if current_shortest_weight > weight:
-                        shortest_paths[next_node] = (current_node, weight)
-                        time_paths[next_node] = (current_node, time)
-
-            next_destinations = {
-                node: shortest_paths[node]
-                for node in shortest_paths
-                if node not in visited
-            }
-            current_node = min(next_destinations, key=lambda k: next_destinations[k][1])
+        if statistics is not None:
+            # The settled states each have one time lookup and relax all their arcs
+            statistics.settled += len(settled)
+            statistics.time_lookups += len(settled)
+            statistics.relaxed += sum(
+                len(edges.get((i // n_speeds, i % n_speeds), ())) for i in settled
+            )
+            statistics.heap_pops += pops
+            statistics.heap_pushes += pops + len(heap)
+
+        return weight_label, time_label, previous, order
+
+    def closed_edges(self, Roadmap, exclusion_zones):
+        """Returns the closed edges of the exclusion zones as a list of (edges, t_start,
+        t_end) tuples for Has_route.search(), or None without exclusion zones."""
+        if not exclusion_zones:
+            return None
+        return [
+            (zone.find_edges(Roadmap), zone.t_start, zone.t_end)
+            for zone in exclusion_zones
+        ]
+
+    def arc_closed(self, closed, edge, t_departure, t_arrival):
+        """True if the edge is closed by an exclusion zone while it is sailed between
+        t_departure and t_arrival."""
+        for edges, t_start, t_end in closed:
+            if edge in edges and t_departure < t_end and t_arrival > t_start:
+                return True
+        return False
+
+    def find_path(self, Roadmap, labels, end):
+        """Returns the path to the end state from the labels of Has_route.search(), as a list
+        of (node, time, weight, speed) tuples, or None if the end state is not reached."""
+        weight_label, time_label, previous, order = labels
+        n_speeds = len(Roadmap.vship[0])
 
         path = []
-        while current_node is not None:
+        current_id = end[0] * n_speeds + end[1]
+        if current_id not in order:
+            return None
+        while current_id >= 0:
             path.append(
                 (
-                    current_node[0],
-                    time_paths[current_node][1],
-                    shortest_paths[current_node][1],
-                    current_node[1],
+                    current_id // n_speeds,
+                    time_label[current_id],
+                    weight_label[current_id],
+                    current_id % n_speeds,
                 )
             )
-            next_node = shortest_paths[current_node][0]
-            current_node = next_node
+            current_id = previous[current_id]
         path = path[::-1]
         return path
 
+    def evaluate_route(self, Roadmap, states, t0, graph_functions):
+        """Returns the path along the given (node, speed) states that departs at t0, as a
+        list of (node, time, weight, speed) tuples like Has_route.dijsktra()."""
+        find_k = Has_route.find_time_axis(self, Roadmap).find_k
+        weights = graph_functions.weights
+        times = graph_functions.time
+
+        weight_to_current_node = 0
+        time_to_current_node = t0
+        path = [(states[0][0], t0, 0, states[0][1])]
+        for current_node, next_node in zip(states[:-1], states[1:]):
+            k = find_k(time_to_current_node)
+            weight_to_current_node = (
+                weight_to_current_node + weights[(current_node, next_node)][k]
+            )
+            time_to_current_node = (
+                time_to_current_node + times[(current_node, next_node)][k]
+            )
+            path.append(
+                (
+                    next_node[0],
+                    time_to_current_node,
+                    weight_to_current_node,
+                    next_node[1],
+                )
+            )
+        return path
+
+    def lower_bound_geodesic(self, Roadmap, stop, graph_functions):
+        """Returns for every node of the Roadmap a lower bound of the weight to the stop node,
+        as a halem.Calc_path.Node_values that computes the bound of a node at the first
+        lookup.
+
+        For the space optimization the lower bound is the great circle distance to the stop node.
+        For the time optimization the great circle distance is divided by the maximum ground
+        speed, which is the maximum sailing velocity of the vessel plus the maximum magnitude
+        of the flow in the Roadmap.
+        """
+        nodes = Roadmap.nodes
+        objective = getattr(graph_functions, "objective", None)
+        if objective == None and graph_functions.weights is graph_functions.time:
+            objective = "time"
+
+        if objective == "space":
+            return Node_values(
+                lambda node: Functions.haversine(nodes[node], nodes[stop])
+            )
+        elif objective == "time":
+            U_max = getattr(Roadmap, "U_max", None)
+            if U_max == None:
+                U_max = ((Roadmap.u ** 2 + Roadmap.v ** 2) ** 0.5).max()
+                Roadmap.U_max = U_max
+            speed = np.max(graph_functions.vship) + U_max
+            return Node_values(
+                lambda node: Functions.haversine(nodes[node], nodes[stop]) / speed
+            )
+        else:
+            raise ValueError(
+                "The geodesic heuristic is only available for the time and space optimization"
+            )
+
+    def lower_bound_landmarks(self, Roadmap, stop, graph_functions):
+        """Returns for every node of the Roadmap the ALT lower bound of the sailing time to
+        the stop node, from the landmark tables in Roadmap.landmarks, as a
+        halem.Calc_path.Node_values that computes the bound of a node at the first lookup."""
+        if getattr(Roadmap, "landmarks", None) == None:
+            raise ValueError(
+                "The Roadmap has no landmarks, use Roadmap.compute_landmarks() first"
+            )
+        if graph_functions.weights is not graph_functions.time:
+            raise ValueError(
+                "The landmark heuristic is only available for the time optimization"
+            )
+
+        vessel_class = self.find_vessel_class(Roadmap, graph_functions)
+        landmarks = Roadmap.landmarks
+        return Node_values(
+            lambda node: landmarks.lower_bound(stop, vessel_class, [node])[0]
+        )
+
+    def corridor_nodes(self, Roadmap, start, stop, corridor=None, buffer=None):
+        """Returns a halem.Calc_path.Node_values which is True for the nodes of the Roadmap
+        that are inside the ellipse (corridor) and the buffer around the straight line
+        between the start and stop node, or None if there is no corridor and no buffer.
+        See halem.Calc_path.Has_route."""
+        if corridor == None and buffer == None:
+            return None
+
+        nodes = Roadmap.nodes
+        if corridor != None:
+            distance = Functions.haversine(nodes[start], nodes[stop])
+        if buffer != None:
+            # Distance to the line in a local equirectangular projection in meters
+            R = 6372800
+            lat = np.radians((nodes[start, 0] + nodes[stop, 0]) / 2)
+            scale = np.radians(1) * R * np.array([1, np.cos(lat)])
+            line = (nodes[stop] - nodes[start]) * scale
+            length = (line ** 2).sum()
+
+        def allowed(node):
+            if node == start or node == stop:
+                return True
+            if corridor != None:
+                to_start = Functions.haversine(nodes[node], nodes[start])
+                to_stop = Functions.haversine(nodes[node], nodes[stop])
+                if not to_start + to_stop <= corridor * distance:
+                    return False
+            if buffer != None:
+                xy = (nodes[node] - nodes[start]) * scale
+                s = 0 if length == 0 else min(max(xy @ line / length, 0), 1)
+                if not ((xy - s * line) ** 2).sum() <= buffer ** 2:
+                    return False
+            return True
+
+        return Node_values(allowed)
+
+    def find_time_axis(self, Roadmap):
+        """Returns the time axis of the Roadmap (halem.Mesh_maker.Time_axis), which is
+        made and stored in the Roadmap if the Roadmap does not have one yet."""
+        time_axis = getattr(Roadmap, "time_axis", None)
+        if time_axis == None:
+            time_axis = Mesh_maker.Time_axis(Roadmap.t, Roadmap.repeat)
+            Roadmap.time_axis = time_axis
+        return time_axis
+
+    def find_edges(self, Roadmap, graph_functions):
+        """Returns the edges of the vessel class of graph_functions (graph_functions.edges),
+        or the edges of all vessel classes (Roadmap.graph.edges)."""
+        edges = getattr(graph_functions, "edges", None)
+        return Roadmap.graph.edges if edges == None else edges
+
+    def feasible(self, Roadmap, start, stop, t0, graph_functions):
+        """False if the connectivity index of the vessel class
+        (halem.Mesh_maker.Connectivity_index) shows that there is no route from the start
+        node to the stop node that departs at t0, without a search. The index is not
+        used for a loading condition that is lighter than the vessel class."""
+        find_connectivity = getattr(Roadmap, "find_connectivity", None)
+        if find_connectivity == None:
+            return True
+        loading = getattr(graph_functions, "loading", None)
+        if loading != None and loading.lighter == True:
+            return True
+        k = Has_route.find_time_axis(self, Roadmap).find_k(t0)
+        index = find_connectivity(self.find_vessel_class(Roadmap, graph_functions))
+        return index.feasible(start, stop, k)
+
+    def find_speed(self, graph_functions):
+        """Returns the index of the sailing velocity at the start and the destination,
+        the fixed sailing velocity graph_functions.speed or else 0."""
+        speed = getattr(graph_functions, "speed", None)
+        return 0 if speed == None else speed
+
+    def find_vessel_class(self, Roadmap, graph_functions):
+        """Returns the index of the vessel class (row of Roadmap.vship) of graph_functions."""
+        vessel_class = getattr(graph_functions, "vessel_class", None)
+        if vessel_class == None:
+            vessel_class = [
+                graph_time.weights is graph_functions.time
+                for graph_time in Roadmap.weight_time
+            ].index(True)
+        return vessel_class
+
     def find_startstop(self, start, nodes):
         node_x = start[1]
         node_y = start[0]
@@ -124,3 +639,330 @@ class Has_route:
             QQ = abs(ts - t)
             k = np.argwhere(QQ == QQ.min())[0][0]
             return k
+
+
+class Has_routes(Has_route):
+    """ This class contains the code for calculating the optimal routes from one start
+    location to multiple destinations, with a single search from the start location
+    that stops when all destinations are reached. The routes are the same as the
+    routes of halem.Calc_path.Has_route for every destination.
+
+    start:              start location (lat, lon)
+    stops:              numpy array with the destinations (lat, lon), shape (M, 2)
+    Roadmap:            Preprocessing file
+    graph_functions:    class that selects the correct weights from the Roadmap.
+    statistics:         None, or a halem.Calc_path.Search_statistics object for the counters
+                        of the search.
+    """
+
+    def __init__(self, start, stops, Roadmap, t0, graph_functions, statistics=None):
+        d = datetime.datetime.strptime(t0, "%d/%m/%Y %H:%M:%S")
+        t0 = d.timestamp()
+
+        start = Roadmap.find_nodes(np.asarray(start))
+        stops = Roadmap.find_nodes(np.atleast_2d(stops))
+
+        speed = self.find_speed(graph_functions)
+        self.start = (start, speed)
+        self.stops = [(stop, speed) for stop in stops]
+
+        labels = self.search(
+            Roadmap, self.start, self.stops, t0, graph_functions, statistics=statistics
+        )
+
+        self.routes = []
+        self.sailing_time = np.full(len(self.stops), np.inf)
+        self.weight = np.full(len(self.stops), np.inf)
+        for i, stop in enumerate(self.stops):
+            path = self.find_path(Roadmap, labels, stop)
+            route = None if path == None else np.array(path)
+            self.routes.append(route)
+            if route is not None:
+                self.sailing_time[i] = route[-1, 1]
+                self.weight[i] = route[-1, 2]
+
+
+class Has_profile(Has_route):
+    """ This class contains the code for calculating the earliest arrival time at the
+    destination as a function of the departure time, for all departure times at once.
+    The arrival times are the same as the arrival times of halem.Calc_path.Has_route
+    for every single departure time.
+
+    start:              start location (lat, lon)
+    stop:               destination location (lat, lon)
+    Roadmap:            Preprocessing file
+    departures:         numpy array with the departure times (timestamps)
+    graph_functions:    class that selects the correct weights from the Roadmap,
+                        for the time optimization.
+    """
+
+    def __init__(self, start, stop, Roadmap, departures, graph_functions):
+        start, stop = Roadmap.find_nodes(np.array([start, stop]))
+
+        speed = self.find_speed(graph_functions)
+        self.start = (start, speed)
+        self.stop = (stop, speed)
+        self.departures = np.asarray(departures, dtype=float)
+        self.arrivals = self.profile_search(
+            Roadmap, self.start, self.stop, self.departures, graph_functions
+        )
+
+    def profile_search(self, Roadmap, initial, end, departures, graph_functions):
+        """Time dependent search with a vector of arrival times in every state, one for
+        every departure time.
+
+        The time dependent Dijkstra of every single departure time gives the arrival
+        times that satisfy time(next state) = min(time(state) + weight(time(state))) over
+        all previous states. With positive travel times this solution is unique, so a
+        label correcting search on the vectors gives the same arrival times. A state is
+        popped from the heap on the minimum of its improved arrival times, and only the
+        departure times that can still improve the arrival time at the destination are
+        propagated.
+        """
+        n_speeds = len(Roadmap.vship[0])
+        n_states = len(Roadmap.nodes) * n_speeds
+
+        edges = self.find_edges(Roadmap, graph_functions)
+        times = graph_functions.time
+        find_k_array = self.find_time_axis(Roadmap).find_k_array
+
+        if len(departures) == 0:
+            return np.array([])
+
+        initial_id = initial[0] * n_speeds + initial[1]
+        end_id = end[0] * n_speeds + end[1]
+
+        time_label = np.full((n_states, len(departures)), np.inf)
+        time_label[initial_id] = departures
+        changed = np.full(n_states, False)
+        changed[initial_id] = True
+        heap = [(departures.min(), initial_id)]
+
+        while heap:
+            current_id = heapq.heappop(heap)[1]
+            if not changed[current_id]:
+                continue
+            changed[current_id] = False
+
+            time_to_current_node = time_label[current_id]
+            active = time_to_current_node < time_label[end_id]
+            if not active.any() or current_id == end_id:
+                continue
+            time_to_current_node = time_to_current_node[active]
+            k = find_k_array(time_to_current_node)
+
+            current_node = (current_id // n_speeds, current_id % n_speeds)
+            for next_node in edges.get(current_node, ()):
+                next_id = next_node[0] * n_speeds + next_node[1]
+                time = time_to_current_node + times[(current_node, next_node)][k]
+                improved = time < time_label[next_id, active]
+                if improved.any():
+                    label = time_label[next_id, active]
+                    label[improved] = time[improved]
+                    time_label[next_id, active] = label
+                    changed[next_id] = True
+                    heapq.heappush(heap, (time[improved].min(), next_id))
+
+        return time_label[end_id]
+
+
+class Label_bag:
+    """Criteria of the labels of a state of halem.Calc_path.Has_pareto_routes, which are
+    added in lexicographic order of the criteria (the order in which the labels are
+    settled). For two criteria the first criterion of the labels is sorted, the test of
+    the dominance is a binary search with the minimum of the second criterion of the
+    labels before it. For more criteria small bags are scanned, and large bags are
+    tested on the rows of a numpy array.
+
+    n_criteria: number of criteria of a label
+    """
+
+    vectorize = 32
+
+    def __init__(self, n_criteria):
+        self.labels = []
+        self.first = []
+        self.second_min = []
+        self.criteria = np.empty((self.vectorize, n_criteria))
+
+    def append(self, criteria):
+        if len(criteria) == 2:
+            second = criteria[1]
+            if self.second_min and self.second_min[-1] < second:
+                second = self.second_min[-1]
+            self.first.append(criteria[0])
+            self.second_min.append(second)
+        else:
+            size = len(self.labels)
+            if size == len(self.criteria):
+                self.criteria = np.concatenate(
+                    [self.criteria, np.empty_like(self.criteria)]
+                )
+            self.criteria[size] = criteria
+        self.labels.append(criteria)
+
+    def dominated(self, bound):
+        """True if a label in the bag is at most bound for all criteria."""
+        if len(bound) == 2:
+            i = bisect.bisect_right(self.first, bound[0])
+            return i > 0 and self.second_min[i - 1] <= bound[1]
+        size = len(self.labels)
+        if size < self.vectorize:
+            for other in self.labels:
+                for a, b in zip(other, bound):
+                    if a > b:
+                        break
+                else:
+                    return True
+            return False
+        return bool((self.criteria[:size] <= bound).all(axis=1).any())
+
+
+class Has_pareto_routes(Has_route):
+    """ This class contains the code for calculating the Pareto optimal routes for multiple
+    objectives (for example sailing time and co2 emission) in a single multi criteria
+    label setting search.
+
+    Every state has a set of labels. A label is not stored if another label of the state
+    is at least as good for all objectives and the sailing time, or if a route to the
+    destination is at least as good for all objectives. The labels are settled in
+    lexicographic order of the objectives, so the routes are found in order of the
+    first objective. A state keeps labels with different arrival times, so on a Roadmap
+    with time dependent weights the first route can be better for the first objective
+    than the route of halem.Calc_path.Has_route, which only keeps the earliest arrival.
+
+    start:              start location (lat, lon)
+    stop:               destination location (lat, lon)
+    Roadmap:            Preprocessing file
+    graph_functions:    class that selects the time weights from the Roadmap.
+    objectives:         list with the weights (Roadmap.weight_*[vessel class].weights) of
+                        every objective
+    max_routes:         None, or the maximum number of routes, the search stops when this
+                        number of routes is found.
+    epsilon:            relative tolerance of the dominance. A label is also not stored if
+                        another label is at most a factor (1 + epsilon) worse for all
+                        objectives, this limits the number of labels of large fronts.
+                        With epsilon larger than 0 the routes approximate the Pareto
+                        front, 0 gives the exact front.
+    """
+
+    def __init__(
+        self,
+        start,
+        stop,
+        Roadmap,
+        t0,
+        graph_functions,
+        objectives,
+        max_routes=None,
+        epsilon=0.01,
+    ):
+        d = datetime.datetime.strptime(t0, "%d/%m/%Y %H:%M:%S")
+        t0 = d.timestamp()
+
+        start, stop = Roadmap.find_nodes(np.array([start, stop]))
+
+        speed = self.find_speed(graph_functions)
+        self.start = (start, speed)
+        self.stop = (stop, speed)
+
+        self.routes, self.values = self.pareto_search(
+            Roadmap,
+            self.start,
+            self.stop,
+            t0,
+            graph_functions,
+            objectives,
+            max_routes,
+            epsilon,
+        )
+
+    def pareto_search(
+        self,
+        Roadmap,
+        initial,
+        end,
+        t0,
+        graph_functions,
+        objectives,
+        max_routes=None,
+        epsilon=0.01,
+    ):
+        """Multi criteria label setting search. Returns a list with a route for every
+        Pareto optimal label of the end state, in the format of Has_route.dijsktra() with
+        the first objective as weight, and a numpy array with the values of the objectives
+        of every route.
+
+        The criteria of a label are the values of the objectives and the sailing time,
+        the arrival time determines the weights of the next arcs. The sailing time is not
+        added again if it is one of the objectives. The routes to the destination
+        (front_bag) are only compared on the objectives.
+        """
+        n_speeds = len(Roadmap.vship[0])
+        edges = self.find_edges(Roadmap, graph_functions)
+        times = graph_functions.time
+        find_k = self.find_time_axis(Roadmap).find_k
+        n_objectives = len(objectives)
+        factor = 1 + epsilon
+
+        criteria_weights = list(objectives)
+        if not any(weights is times for weights in objectives):
+            criteria_weights.append(times)
+        time_index = [weights is times for weights in criteria_weights].index(True)
+        n_criteria = len(criteria_weights)
+
+        # label: (criteria, state, previous label)
+        labels = [((0,) * n_criteria, initial, -1)]
+        bags = {}
+        front = []
+        front_bag = Label_bag(n_objectives)
+        heap = [(labels[0][0], 0)]
+
+        while heap:
+            criteria, label = heapq.heappop(heap)
+            current_node = labels[label][1]
+            state_id = current_node[0] * n_speeds + current_node[1]
+            bag = bags.get(state_id)
+            if bag is None:
+                bag = bags[state_id] = Label_bag(n_criteria)
+            bound = [factor * value for value in criteria]
+            if front_bag.dominated(bound[:n_objectives]) or bag.dominated(bound):
+                continue
+            bag.append(criteria)
+
+            if current_node == end:
+                front.append(label)
+                front_bag.append(criteria[:n_objectives])
+                if max_routes != None and len(front) >= max_routes:
+                    break
+                continue
+
+            k = find_k(t0 + criteria[time_index])
+            for next_node in edges.get(current_node, ()):
+                edge = (current_node, next_node)
+                next_criteria = tuple(
+                    value + weights[edge][k]
+                    for value, weights in zip(criteria, criteria_weights)
+                )
+                if np.inf in next_criteria:
+                    continue
+                bound = [factor * value for value in next_criteria]
+                if front_bag.dominated(bound[:n_objectives]):
+                    continue
+                next_bag = bags.get(next_node[0] * n_speeds + next_node[1])
+                if next_bag is not None and next_bag.dominated(bound):
+                    continue
+                labels.append((next_criteria, next_node, label))
+                heapq.heappush(heap, (next_criteria, len(labels) - 1))
+
+        routes = []
+        for label in front:
+            path = []
+            while label >= 0:
+                criteria, state, label = labels[label]
+                path.append(
+                    (state[0], t0 + criteria[time_index], criteria[0], state[1])
+                )
+            routes.append(path[::-1])
+        values = np.array([labels[label][0][:n_objectives] for label in front])
+        return routes, values.reshape(-1, n_objectives)
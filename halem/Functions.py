@@ -43,7 +43,9 @@ def Squat(h, T, V_max, LWL, WWL, ukc, WVPI):
     """Function for reducing the sailing velocity in deep water to the sailing velocity in shallow unconfined waters. 
 
     h:                              Array of the water depth in meters
-    V_max:                          Sailing velocity in deep water in meters per second
+    V_max:                          Sailing velocity in deep water in meters per second, or an array
+                                    of sailing velocities that is broadcast against h, for example
+                                    h[..., None] and an array of all sailing velocities of a vessel
     WWL:                            Width over Water Line of the vessel in meters 
     LWL:                            Length over Water Line of the vessel in meters   
     ukc:                            Minimal needed under keel clearance in  meters. 
@@ -52,6 +54,7 @@ def Squat(h, T, V_max, LWL, WWL, ukc, WVPI):
     WVPI:                           total weight of the the vessel in tf
 
     V:                              Array of sailing velocities reduced for squat, corresponding to the input arrat h. 
+                                    The shape is the broadcast shape of h, T, and V_max.
     """
     Gamma_water = 1025
     b = 9 * WWL
@@ -71,19 +74,52 @@ def Squat(h, T, V_max, LWL, WWL, ukc, WVPI):
     V1Vinf = ((np.exp(ghv2) - np.exp(-ghv2)) / (np.exp(ghv2) + np.exp(-ghv2))) ** 0.5
 
     V_grens = V_max * V1Vinf * VhV1
-    V_squat_max = np.zeros(len(h))
-    V = np.zeros(len(h))
-    for i in range(len(h)):
-        V_squat_max[i] = (
-            0
-            if squat_max[i] < 0
-            else (squat_max[i] * 30 / CB / (AsAc[i] ** (2 / 3))) ** (1 / 2.08)
+    with np.errstate(invalid="ignore"):
+        V_squat_max = np.where(
+            squat_max < 0, 0, (squat_max * 30 / CB / (AsAc ** (2 / 3))) ** (1 / 2.08)
         )
-        V[i] = V_grens[i] if V_squat_max[i] > V_grens[i] else V_squat_max[i]
+        V = np.where(V_squat_max > V_grens, V_grens, V_squat_max)
 
     return V
 
 
+class Squat_table:
+    """Lookup table of halem.Functions.Squat() as a function of the water depth, for all
+    sailing velocities of a vessel class. Between the depths of the table the sailing
+    velocity is interpolated linearly, outside the table the first or last value is used.
+
+    depths:     numpy array with the increasing water depths of the table in meters
+    T, V_max, LWL, WWL, ukc, WVPI:  see halem.Functions.Squat(), V_max can be an array with
+                                    all sailing velocities of the vessel class
+    """
+
+    def __init__(self, depths, T, V_max, LWL, WWL, ukc, WVPI):
+        self.depths = np.asarray(depths, dtype=float)
+        self.V_max = np.atleast_1d(np.asarray(V_max, dtype=float))
+        with np.errstate(all="ignore"):
+            self.V = Squat(
+                self.depths[:, None], T, self.V_max[None, :], LWL, WWL, ukc, WVPI
+            )
+
+    def __call__(self, h, V_max=None):
+        """Returns the sailing velocities for the water depths h, with shape h.shape plus
+        the number of sailing velocities, or h.shape for a single sailing velocity in deep
+        water V_max of the table."""
+        h = np.asarray(h, dtype=float)
+        if V_max == None:
+            V = self.V
+        else:
+            (speed,) = np.flatnonzero(self.V_max == V_max)
+            V = self.V[:, speed]
+        idx = np.clip(np.searchsorted(self.depths, h), 1, len(self.depths) - 1)
+        w = np.clip(
+            (h - self.depths[idx - 1]) / (self.depths[idx] - self.depths[idx - 1]), 0, 1
+        )
+        if V_max == None:
+            w = w[..., None]
+        return V[idx - 1] * (1 - w) + V[idx] * w
+
+
 def inbetweenpoints(start, stop, LL, tria):
     """This node returns the nodes of influence for a specific arc. This function 
     retruns the start and stop node plus the nodes in between the start and stop 
@@ -134,24 +170,49 @@ def haversine(coord1, coord2):
     return 2 * R * math.atan2(math.sqrt(a), math.sqrt(1 - a))
 
 
-def costfunction_timeseries(edge, V_max, WD_min, flow, WVPI, L, tria):
-    """ Function that returns the time series of the weights of a specific edge.
+def haversine_array(coord1, coord2):
+    """Vectorized version of halem.Functions.haversine(). Returns the distance in
+    meters between the points in coord1 and coord2.
+
+    coord1:     (lat, lon) coordinates or numpy array with shape (N, 2) of (lat, lon) coordinates
+    coord2:     (lat, lon) coordinates or numpy array with shape (N, 2) of (lat, lon) coordinates
+    """
+    R = 6372800
+    coord1 = np.radians(np.asarray(coord1, dtype=float))
+    coord2 = np.radians(np.asarray(coord2, dtype=float))
+
+    phi1, phi2 = coord1[..., 0], coord2[..., 0]
+    dphi = phi2 - phi1
+    dlambda = coord2[..., 1] - coord1[..., 1]
+
+    a = np.sin(dphi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlambda / 2) ** 2
+
+    return 2 * R * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def heading_array(coord1, coord2):
+    """Returns the direction in radians (counterclockwise from east, in the lon lat plane)
+    of the lines from coord1 to coord2, the angle alpha1 of the costfunctions.
+
+    coord1:     (lat, lon) coordinates or numpy array with shape (N, 2) of (lat, lon) coordinates
+    coord2:     (lat, lon) coordinates or numpy array with shape (N, 2) of (lat, lon) coordinates
+    """
+    coord1 = np.asarray(coord1, dtype=float)
+    coord2 = np.asarray(coord2, dtype=float)
+    return np.arctan2(coord2[..., 0] - coord1[..., 0], coord2[..., 1] - coord1[..., 1])
+
+
+def flow_aggregates(edge, flow, L, tria):
+    """ Function that returns the mean flow velocities (u, v) and the minimal water depth
+    over the nodes of influence of an edge (see halem.Functions.inbetweenpoints()), as
+    time series. The values are the same for both directions of the edge.
 
     edge:       (int) cosidered edge. edge: index of the location node 
                 in Roadmap.nodes
-    V_max:      Shipping velocity in deep water  in meters per second
-    WD_min:     minimal needed draft in meters
     flow:       Class that contains the hydrodynamic conditions
-    WVPI:       Weight of the vessel in tf
     L:         (int) number of neighbouring layers.         
     tria:       triangulation of the nodes (output of scipy.spatial.Delaunay(nodes)
     """
-
-    xfrom = flow.nodes[edge[0]][1]
-    yfrom = flow.nodes[edge[0]][0]
-    xto = flow.nodes[edge[1]][1]
-    yto = flow.nodes[edge[1]][0]
-
     IB = inbetweenpoints(edge[0], edge[1], L, tria)
 
     v_w = flow.v[IB[0]]
@@ -167,98 +228,124 @@ def costfunction_timeseries(edge, V_max, WD_min, flow, WVPI, L, tria):
     # WD_W= WD_W / len(IB)
     v_w = v_w / len(IB)
     u_w = u_w / len(IB)
-    U_w = (u_w ** 2 + v_w ** 2) ** 0.5
-
-    vship = Squat(WD_W, WD_min, V_max, flow.LWL, flow.WWL, flow.ukc, WVPI)
-    # vship = V_max + 0 * WD_W
-
-    alpha1 = np.arctan2((yto - yfrom), (xto - xfrom))
-    alpha2 = np.arctan2(v_w, u_w) - alpha1
-
-    s_t1 = U_w * np.cos(alpha2)
-    s_t2 = vship ** 2 - (U_w * np.sin(alpha2)) ** 2
-    s_t = np.array(
-        [s_t1[i] + s_t2[i] ** 0.5 if s_t2[i] > 0 else 0 for i in range(len(s_t1))]
-    )
-
-    u_t = np.cos(alpha1) * (s_t)
-    v_t = np.sin(alpha1) * (s_t)
-
-    L = haversine((yfrom, xfrom), (yto, xto))
-    U_t = (u_t ** 2 + v_t ** 2) ** 0.5
-    t = np.array([L / U_t1 if U_t1 > 0 else np.inf for U_t1 in U_t])
-
-    t[U_t == np.inf] = np.inf
-    t[np.isnan(t)] = np.inf
-    t[WD_W < WD_min + flow.ukc] = np.inf
-    t[WD_W < WD_min + flow.ukc] = np.inf
-    t[(U_w * np.sin(alpha2)) ** 2 > vship ** 2] = np.inf
-    t[np.isnan(s_t)] = np.inf
-    t[s_t < 0] = np.inf
-    return np.array(t)
-
-
-def costfunction_spaceseries(edge, V_max, WD_min, flow, WVPI, L, tria):
-    """ Function that returns the time series of the weights of a specifiv edge.
+    return u_w, v_w, WD_W
+
+
+def costfunction_series(
+    edge,
+    V_max,
+    WD_min,
+    flow,
+    WVPI,
+    L,
+    tria,
+    length=None,
+    heading=None,
+    squat=None,
+    aggregates=None,
+    ukc=None,
+):
+    """ Function that returns the time series of the sailing time, the sailed distance, and
+    the navigability of a specific edge, from one evaluation of the hydrodynamic conditions
+    for one or more sailing velocities.
 
     edge:       (int) cosidered edge. edge: index of the location node 
                 in Roadmap.nodes
-    V_max:      Shipping velocity in deep water  in meters per second
+    V_max:      Shipping velocity in deep water in meters per second, or numpy array with
+                shape (S,) of shipping velocities
     WD_min:     minimal needed draft in meters
     flow:       Class that contains the hydrodynamic conditions
     WVPI:       Weight of the vessel in tf
     L:         (int) number of neighbouring layers.         
     tria:       triangulation of the nodes (output of scipy.spatial.Delaunay(nodes)
+    length:     None, or the length of the edge in meters (Roadmap.edge_length)
+    heading:    None, or the direction of the edge in radians (Roadmap.edge_heading)
+    squat:      None, or a halem.Functions.Squat_table of the vessel that contains V_max
+
+    aggregates: None, or the output of halem.Functions.flow_aggregates() for the edge, which
+                is the same for both directions of the edge
+    ukc:        None, or the under keel clearance in meters if it differs from flow.ukc
+
+    returns the sailing time, the sailed distance, and the boolean navigability, with
+    shape (T,) for a single shipping velocity or (T, S). The time and the distance are
+    np.inf if the edge is not navigable.
     """
 
     xfrom = flow.nodes[edge[0]][1]
     yfrom = flow.nodes[edge[0]][0]
     xto = flow.nodes[edge[1]][1]
     yto = flow.nodes[edge[1]][0]
-    IB = inbetweenpoints(edge[0], edge[1], L, tria)
-    v_w = flow.v[IB[0]]
-    u_w = flow.u[IB[0]]
-    WD_W = flow.WD[IB[0]]
-    for i in range(1, len(IB)):
-        v_w = v_w + flow.v[IB[i]]
-        u_w = u_w + flow.u[IB[i]]
 
-        # WD_W = WD_W + flow.WD[IB[i]]
-        WD_W = np.minimum(WD_W, flow.WD[IB[i]])
-
-    # WD_W= WD_W / len(IB)
-    v_w = v_w / len(IB)
-    u_w = u_w / len(IB)
+    if aggregates == None:
+        aggregates = flow_aggregates(edge, flow, L, tria)
+    if ukc == None:
+        ukc = flow.ukc
+    u_w, v_w, WD_W = aggregates
     U_w = (u_w ** 2 + v_w ** 2) ** 0.5
 
-    vship = Squat(WD_W, WD_min, V_max, flow.LWL, flow.WWL, flow.ukc, WVPI)
+    # The sailing velocities are the last axis
+    V_max = np.asarray(V_max, dtype=float)
+    if squat == None:
+        vship = Squat(
+            WD_W[:, None], WD_min, V_max.reshape(1, -1), flow.LWL, flow.WWL, ukc, WVPI,
+        )
+    else:
+        vship = np.stack([squat(WD_W, V) for V in V_max.reshape(-1)], axis=-1)
 
-    alpha1 = np.arctan2((yto - yfrom), (xto - xfrom))
-    alpha2 = np.arctan2(v_w, u_w) - alpha1
+    if heading == None:
+        heading = heading_array((yfrom, xfrom), (yto, xto))
+    alpha1 = heading
+    alpha2 = (np.arctan2(v_w, u_w) - alpha1)[:, None]
+    U_w = U_w[:, None]
 
     s_t1 = U_w * np.cos(alpha2)
     s_t2 = vship ** 2 - (U_w * np.sin(alpha2)) ** 2
-    s_t = np.array(
-        [s_t1[i] + s_t2[i] ** 0.5 if s_t2[i] > 0 else 0 for i in range(len(s_t1))]
-    )
+    with np.errstate(invalid="ignore", divide="ignore"):
+        s_t = np.where(s_t2 > 0, s_t1 + np.where(s_t2 > 0, s_t2, 0) ** 0.5, 0)
 
-    u_t = np.cos(alpha1) * (s_t)
-    v_t = np.sin(alpha1) * (s_t)
+        u_t = np.cos(alpha1) * (s_t)
+        v_t = np.sin(alpha1) * (s_t)
 
-    L = haversine((yfrom, xfrom), (yto, xto))
-    U_t = (u_t ** 2 + v_t ** 2) ** 0.5
-    t = np.array([L / U_t1 if U_t1 > 0 else np.inf for U_t1 in U_t])
+        L = haversine((yfrom, xfrom), (yto, xto)) if length == None else length
+        U_t = (u_t ** 2 + v_t ** 2) ** 0.5
+        t = np.where(U_t > 0, L / U_t, np.inf)
 
     t[U_t == np.inf] = np.inf
     t[np.isnan(t)] = np.inf
-    t[WD_W < WD_min + flow.ukc] = np.inf
-    t[WD_W < WD_min + flow.ukc] = np.inf
-    t[(U_w * np.sin(alpha2)) ** 2 > vship ** 2] = np.inf
+    t[WD_W < WD_min + ukc] = np.inf
+    t[((U_w * np.sin(alpha2)) ** 2 > vship ** 2)] = np.inf
     t[np.isnan(s_t)] = np.inf
     t[s_t < 0] = np.inf
-    t[t != np.inf] = L
 
-    return np.array(t)
+    navigable = t != np.inf
+    space = np.where(navigable, L, np.inf)
+
+    shape = WD_W.shape + V_max.shape
+    return t.reshape(shape), space.reshape(shape), navigable.reshape(shape)
+
+
+def costfunction_timeseries(
+    edge, V_max, WD_min, flow, WVPI, L, tria, length=None, heading=None, squat=None
+):
+    """ Function that returns the time series of the weights of a specific edge.
+    (see halem.Functions.costfunction_series())
+    """
+    t, _, _ = costfunction_series(
+        edge, V_max, WD_min, flow, WVPI, L, tria, length, heading, squat
+    )
+    return t
+
+
+def costfunction_spaceseries(
+    edge, V_max, WD_min, flow, WVPI, L, tria, length=None, heading=None, squat=None
+):
+    """ Function that returns the time series of the weights of a specifiv edge.
+    (see halem.Functions.costfunction_series())
+    """
+    _, space, _ = costfunction_series(
+        edge, V_max, WD_min, flow, WVPI, L, tria, length, heading, squat
+    )
+    return space
 
 
 def nodes_on_land_None(nodes, u, v, WD):
@@ -1,8 +1,11 @@
 from IPython.display import clear_output
 from scipy.signal import argrelextrema
 import halem.Functions as Functions
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
 import scipy.spatial
+import scipy.sparse
+import scipy.sparse.csgraph
+import bisect
 from numpy import ma
 import numpy as np
 import time
@@ -41,6 +44,7 @@ class Graph_flow_model:
     WVPI:   Numpy array with the total weight of the vessel.
 
     compute_cost:   Lambda function that returns the cost for sailing based on the travel time and the travel velocity.
+                    The function is stored in the Roadmap, use a module level function to save the Roadmap.
 
     compute_co2:    Lambda function that returns the emmision for sailing based on the travel time and the travel velocity. 
          
@@ -60,6 +64,20 @@ class Graph_flow_model:
     nodes_index:    Numpy array that contains the indices of the nodes of the reduced hydrodynamic model.
                     nodes_index is the output of Roadmap.nodes_index. This option allows you to skip the 
                     node reduction step if this is already done.                                                           
+    number_of_landmarks:    Number of landmarks for the ALT lower bounds of the time optimization.
+                            0 skips the landmark preprocessing. The landmarks can also be added later
+                            with Roadmap.compute_landmarks().
+    prune_edges:            True to remove the arcs that are not navigable at any time step
+                            (infinite weights for all optimization types) for a vessel class.
+                            See Roadmap.prune_edges().
+    speed_transitions:      'all' to connect every sailing velocity on a node to every sailing
+                            velocity on the next node, or 'adjacent' to only allow a change to
+                            the next higher or lower sailing velocity of vship. This reduces the
+                            number of arcs for fine discretisations of the sailing velocity.
+    squat_table:            None to compute the squat (halem.Functions.Squat()) for every arc, or the
+                            number of water depths of a lookup table per vessel class
+                            (halem.Functions.Squat_table) from which the squat is interpolated.
+                            This is faster for large meshes, but not exact near the minimal depth.
     """
 
     def __init__(
@@ -82,20 +100,14 @@ class Graph_flow_model:
         repeat=False,
         optimization_type=["time", "space", "cost", "co2"],
         nodes_index=np.array([None]),
+        number_of_landmarks=0,
+        prune_edges=True,
+        speed_transitions="all",
+        squat_table=None,
     ):
-        def compute_cost_f(week_rate, fuel_rate):
-            second_rate = week_rate / 7 / 24 / 60 / 60
-            return lambda travel_time, speed: (
-                travel_time * second_rate + fuel_rate * travel_time * speed ** 3
-            )
-
-        def compute_co2_f(fuel_rate):
-            return lambda travel_time, speed: (fuel_rate * travel_time * speed ** 3)
-
-        if compute_cost == None:
-            compute_cost = compute_cost_f(700_000, 0.0008)
-        if compute_co2 == None:
-            compute_co2 = compute_co2_f(1)
+        compute_cost, compute_co2 = cost_functions(compute_cost, compute_co2)
+        self.compute_cost = compute_cost
+        self.compute_co2 = compute_co2
 
         self.WWL = WWL
         self.LWL = LWL
@@ -103,6 +115,11 @@ class Graph_flow_model:
         self.WVPI = WVPI
         self.repeat = repeat
         self.vship = vship
+        self.speed_transitions = speed_transitions
+        self.squat_table = squat_table
+        self.number_of_neighbor_layers = number_of_neighbor_layers
+        # Incremented on every change of the weights, for the invalidation of cached routes
+        self.version = 0
 
         # 'Load Flow'
         flow = Load_flow(name_textfile_flow)  # ABC van maken
@@ -125,21 +142,28 @@ class Graph_flow_model:
 
         self.tria = scipy.spatial.Delaunay(self.nodes)
         self.t = flow.t
-        self.mask = np.full(self.u.shape, False)
-        self.mask[self.WD < WD_min.max() + ukc] = True
+        self.time_axis = Time_axis(self.t, self.repeat)
+        # Bit-packed masks of the time steps at which the nodes are too shallow, for
+        # every vessel class and for the deepest draft (Roadmap.mask)
+        self.masks = [Navigability_mask(self.WD, draft + ukc) for draft in WD_min]
+        self.mask = self.masks[int(np.argmax(WD_min))]
         self.WD_min = WD_min
         clear_output(wait=True)
         print("2/4")
 
         # 'Calculate edges'
-        graph0 = Graph()
+        edges = []
         for from_node in range(len(self.nodes)):
             to_nodes = Functions.find_neighbors2(
                 from_node, self.tria, number_of_neighbor_layers
             )
             for to_node in to_nodes:
-                L = Functions.haversine(self.nodes[from_node], self.nodes[int(to_node)])
-                graph0.add_edge(from_node, int(to_node), L)
+                edges.append((from_node, int(to_node)))
+        self.compute_edge_geometry(edges)
+
+        graph0 = Graph()
+        for edge in edges:
+            graph0.add_edge(edge[0], edge[1], self.edge_length[edge])
         clear_output(wait=True)
 
         self.graph = Graph()
@@ -147,6 +171,8 @@ class Graph_flow_model:
         for edge in graph0.weights:
             for i in range(len(vship1)):
                 for j in range(len(vship1)):
+                    if not speed_transition_allowed(i, j, speed_transitions):
+                        continue
                     from_node = edge[0]
                     to_node = edge[1]
                     self.graph.add_edge((from_node, i), (to_node, j), 1)
@@ -156,41 +182,57 @@ class Graph_flow_model:
         # 'Calculate Weights'
 
         if self.repeat == True:
-            calc_weights = self.calc_weights_time
+            calc_weights = self.calc_weights_edge
         else:
-            calc_weights = self.calc_weights_time
+            calc_weights = self.calc_weights_edge
 
         self.weight_space = []  # Moet een Dict worden
         self.weight_time = []
         self.weight_cost = []
         self.weight_co2 = []
 
+        # The flow conditions are the same in both directions of an edge, so these are
+        # computed once per pair of nodes for both directions and all vessel classes
+        edge_weights = [{} for vv in range(len(self.vship))]
+        for edge in graph0.weights:
+            if len(self.vship) == 0 or edge in edge_weights[0]:
+                continue
+            aggregates = Functions.flow_aggregates(
+                edge, self, number_of_neighbor_layers, self.tria
+            )
+            pair = [edge]
+            if edge[::-1] in graph0.weights and edge[0] != edge[1]:
+                pair.append(edge[::-1])
+            for vv in range(len(self.vship)):
+                for directed_edge in pair:
+                    edge_weights[vv][directed_edge] = calc_weights(
+                        directed_edge,
+                        self.vship[vv],
+                        self.WD_min[vv],
+                        self.WVPI[vv],
+                        self,
+                        compute_cost,
+                        compute_co2,
+                        number_of_neighbor_layers,
+                        aggregates=aggregates,
+                        mask=self.masks[vv],
+                    )
+
         for vv in range(len(self.vship)):
             graph_time = Graph()
             graph_space = Graph()
             graph_cost = Graph()
             graph_co2 = Graph()
             vship = self.vship[vv]
-            WD_min = self.WD_min[vv]
-            WVPI = self.WVPI[vv]
             for edge in graph0.weights:
+                weights = edge_weights[vv].pop(edge)
                 for i in range(len(vship)):
                     for j in range(len(vship)):
+                        if not speed_transition_allowed(i, j, speed_transitions):
+                            continue
                         from_node = edge[0]
                         to_node = edge[1]
-
-                        L, W, euros, co2 = calc_weights(
-                            edge,
-                            i,
-                            j,
-                            vship,
-                            WD_min,
-                            WVPI,
-                            self,
-                            compute_cost,
-                            compute_co2,
-                            number_of_neighbor_layers,
-                        )
+                        L, W, euros, co2 = weights[j]
 
                         graph_time.add_edge((from_node, i), (to_node, j), W)
                         graph_space.add_edge((from_node, i), (to_node, j), L)
@@ -209,9 +251,295 @@ class Graph_flow_model:
             clear_output(wait=True)
             print(np.round((vv + 1) / len(self.vship) * 100, 2), "%")
 
+        if prune_edges == True:
+            self.prune_edges()
+
+        if number_of_landmarks > 0 and "time" in optimization_type:
+            self.compute_landmarks(number_of_landmarks)
+
         clear_output(wait=True)
         print("4/4")
 
+    def prune_edges(self):
+        """Removes the arcs of which the weights are infinite at all time steps for all
+        optimization types, separately for every vessel class. The arcs are removed from
+        the weights and the edges of the graphs of the vessel class (Roadmap.weight_*[vv]),
+        arcs that are removed for all vessel classes are also removed from Roadmap.graph.
+        States without any remaining arcs are removed from the edges.
+
+        The number of removed arcs and states of every vessel class is stored in
+        Roadmap.pruned, a list with a dict for every vessel class.
+        """
+        self.pruned = []
+        removed_all = None
+        for vv in range(len(self.vship)):
+            graphs = [
+                weights[vv]
+                for weights in (
+                    self.weight_time,
+                    self.weight_space,
+                    self.weight_cost,
+                    self.weight_co2,
+                )
+                if len(weights) > vv
+            ]
+            if len(graphs) == 0:
+                continue
+
+            removed = set(
+                edge
+                for edge in graphs[0].weights
+                if all(np.isinf(graph.weights[edge]).all() for graph in graphs)
+            )
+            states = set(graphs[0].edges) | set(edge[1] for edge in graphs[0].weights)
+            for graph in graphs:
+                for edge in removed:
+                    del graph.weights[edge]
+                self.remove_edges(graph.edges, removed)
+            remaining = set(graphs[0].edges) | set(
+                edge[1] for edge in graphs[0].weights
+            )
+
+            self.pruned.append(
+                {"edges": len(removed), "states": len(states) - len(remaining)}
+            )
+            removed_all = removed if removed_all == None else removed_all & removed
+
+        if removed_all != None:
+            self.remove_edges(self.graph.edges, removed_all)
+            for edge in removed_all:
+                self.graph.weights.pop(edge, None)
+        print(
+            "Pruned arcs per vessel class:",
+            [pruned["edges"] for pruned in self.pruned],
+        )
+
+    def remove_edges(self, edges, removed):
+        """Removes the arcs in the set removed from the dict edges of a Graph, states
+        without remaining arcs are removed from the dict."""
+        for from_node in list(edges):
+            to_nodes = [
+                to_node
+                for to_node in edges[from_node]
+                if (from_node, to_node) not in removed
+            ]
+            if to_nodes:
+                edges[from_node] = to_nodes
+            else:
+                del edges[from_node]
+
+    def compute_edge_geometry(self, edges):
+        """Computes the length in meters (Roadmap.edge_length) and the direction in radians
+        (Roadmap.edge_heading) of all edges at once, as dicts with the (from_node, to_node)
+        edges as keys. The costfunctions and the route post-processing use these values.
+
+        edges:      list of (from_node, to_node) tuples of indices of Roadmap.nodes
+        """
+        edge_array = np.array(edges, dtype=int).reshape(-1, 2)
+        coord1 = self.nodes[edge_array[:, 0]]
+        coord2 = self.nodes[edge_array[:, 1]]
+        self.edge_length = dict(zip(edges, Functions.haversine_array(coord1, coord2)))
+        self.edge_heading = dict(zip(edges, Functions.heading_array(coord1, coord2)))
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # The loading conditions are caches of the queries
+        state.pop("loadings", None)
+        return state
+
+    def find_cost_functions(self):
+        """Returns the cost functions (compute_cost, compute_co2) of the Roadmap, the
+        default functions for a Roadmap that is saved without them."""
+        return cost_functions(
+            getattr(self, "compute_cost", None), getattr(self, "compute_co2", None)
+        )
+
+    def find_squat_table(self, vship, WD_min, WVPI, ukc=None):
+        """Returns the squat lookup table (halem.Functions.Squat_table) of the vessel with
+        the sailing velocities vship, draft WD_min and weight WVPI, or None if the Roadmap
+        is made without squat tables. The tables are made at the first call. The under
+        keel clearance is Roadmap.ukc if ukc is None."""
+        if getattr(self, "squat_table", None) == None:
+            return None
+        if ukc == None:
+            ukc = self.ukc
+        squat_tables = self.__dict__.setdefault("squat_tables", {})
+        key = (tuple(np.atleast_1d(vship)), WD_min, WVPI, ukc)
+        if key not in squat_tables:
+            WD = self.WD[np.isfinite(self.WD)]
+            depths = np.linspace(0, max(WD.max(), WD_min + ukc), self.squat_table)
+            squat_tables[key] = Functions.Squat_table(
+                depths, WD_min, vship, self.LWL, self.WWL, ukc, WVPI
+            )
+        return squat_tables[key]
+
+    def find_loading(self, vessel_class, draft=None, ukc=None):
+        """Returns the halem.Mesh_maker.Loading_condition of the vessel class for the
+        draft and under keel clearance of a query (Roadmap.WD_min[vessel_class] and
+        Roadmap.ukc if None). The last few loading conditions are kept, so that
+        queries with the same loading share the evaluated edges. The loading conditions
+        are not saved with the Roadmap."""
+        if draft == None:
+            draft = self.WD_min[vessel_class]
+        if ukc == None:
+            ukc = self.ukc
+        loadings = self.__dict__.setdefault("loadings", OrderedDict())
+        key = (vessel_class, float(draft), float(ukc), getattr(self, "version", 0))
+        if key in loadings:
+            loadings.move_to_end(key)
+        else:
+            loadings[key] = Loading_condition(self, vessel_class, draft, ukc)
+            while len(loadings) > 8:
+                loadings.popitem(last=False)
+        return loadings[key]
+
+    def find_nodes(self, coordinates):
+        """Returns the index of the nearest Roadmap node for every coordinate, with the
+        same result as halem.Calc_path.Has_route.find_startstop(). The spatial index
+        (halem.Mesh_maker.Node_index) is made at the first call and stored in the Roadmap.
+
+        coordinates:    numpy array with shape (N, 2), or a single coordinate, in the
+                        same order as Roadmap.nodes (lat, lon)
+        """
+        node_index = getattr(self, "node_index", None)
+        if node_index == None:
+            node_index = Node_index(self.nodes)
+            self.node_index = node_index
+        return node_index.find_nodes(coordinates)
+
+    def update_depths(self, nodes, WD):
+        """Updates the water depths of a set of nodes, for example after a new depth survey,
+        without building the Roadmap again. Only the weights (including the FIFO
+        correction) of the edges of which the nodes of influence
+        (halem.Functions.inbetweenpoints()) contain an updated node are computed again.
+        The squat tables are made again, if the update changes the largest water depth
+        of the Roadmap the depths of the tables change and all edges are computed again.
+        Arcs that are not navigable at any time step are removed if the Roadmap is pruned,
+        and added again if they become navigable.
+
+        Roadmap.version is incremented. The landmarks are removed, because they are no
+        longer valid, and can be made again with Roadmap.compute_landmarks().
+
+        The weights are computed with the cost functions of the Roadmap
+        (Roadmap.compute_cost and Roadmap.compute_co2).
+
+        nodes:          indices of the updated nodes in Roadmap.nodes
+        WD:             numpy array with the new water depths, shape (len(nodes), number
+                        of time steps)
+
+        returns the list of (from_node, to_node) edges of which the weights are updated
+        """
+        nodes = np.atleast_1d(np.asarray(nodes, dtype=int))
+        compute_cost, compute_co2 = self.find_cost_functions()
+        layers = self.number_of_neighbor_layers
+
+        WD_max = self.WD[np.isfinite(self.WD)].max()
+        self.WD[nodes] = WD
+        self.__dict__.pop("squat_tables", None)
+        for mask in self.masks:
+            mask.update(self.WD, nodes)
+
+        changed = set(nodes.tolist())
+        near = set(changed)
+        for node in changed:
+            near.update(
+                int(n) for n in Functions.find_neighbors2(node, self.tria, layers)
+            )
+        edges = [
+            edge
+            for edge in self.edge_length
+            if edge[0] in near
+            and changed.intersection(
+                np.asarray(
+                    Functions.inbetweenpoints(edge[0], edge[1], layers, self.tria)
+                ).tolist()
+            )
+        ]
+        if getattr(self, "squat_table", None) != None:
+            if self.WD[np.isfinite(self.WD)].max() != WD_max:
+                edges = list(self.edge_length)
+
+        pruned = getattr(self, "pruned", None) != None
+        objectives = (
+            self.weight_space,
+            self.weight_time,
+            self.weight_cost,
+            self.weight_co2,
+        )
+        for vv in range(len(self.vship)):
+            vship = self.vship[vv]
+            graphs = [weights[vv] for weights in objectives if len(weights) > vv]
+            for graph in graphs:
+                graph.__dict__.pop("restricted", None)
+            for edge in edges:
+                weights = self.calc_weights_edge(
+                    edge,
+                    vship,
+                    self.WD_min[vv],
+                    self.WVPI[vv],
+                    self,
+                    compute_cost,
+                    compute_co2,
+                    layers,
+                    mask=self.masks[vv],
+                )
+                for i in range(len(vship)):
+                    for j in range(len(vship)):
+                        if not speed_transition_allowed(i, j, self.speed_transitions):
+                            continue
+                        arc = ((edge[0], i), (edge[1], j))
+                        values = [
+                            value
+                            for value, weights_of in zip(weights[j], objectives)
+                            if len(weights_of) > vv
+                        ]
+                        navigable = not all(np.isinf(value).all() for value in values)
+                        for graph, value in zip(graphs, values):
+                            if navigable or not pruned:
+                                graph.set_edge(arc[0], arc[1], value)
+                            else:
+                                graph.remove_edge(arc[0], arc[1])
+
+        # Roadmap.graph contains the arcs of all vessel classes
+        self.graph.__dict__.pop("restricted", None)
+        for edge in edges:
+            for i in range(len(self.vship[0])):
+                for j in range(len(self.vship[0])):
+                    if not speed_transition_allowed(i, j, self.speed_transitions):
+                        continue
+                    arc = ((edge[0], i), (edge[1], j))
+                    if any(
+                        arc in weights[vv].weights
+                        for weights in objectives
+                        for vv in range(len(weights))
+                    ):
+                        self.graph.set_edge(arc[0], arc[1], 1)
+                    else:
+                        self.graph.remove_edge(arc[0], arc[1])
+
+        self.landmarks = None
+        self.version += 1
+        return edges
+
+    def find_connectivity(self, vessel_class):
+        """Returns the connectivity index (halem.Mesh_maker.Connectivity_index) of the vessel
+        class. The index is made at the first call and again after a change of the weights
+        (Roadmap.version), and stored in Roadmap.connectivity."""
+        connectivity = self.__dict__.setdefault("connectivity", {})
+        index = connectivity.get(vessel_class)
+        if index == None or index.version != getattr(self, "version", 0):
+            index = Connectivity_index(self, vessel_class)
+            connectivity[vessel_class] = index
+        return index
+
+    def compute_landmarks(self, number_of_landmarks=8):
+        """Optional preprocessing step that stores the landmark (ALT) tables of the
+        time optimization in Roadmap.landmarks. See halem.Mesh_maker.Landmarks.
+
+        number_of_landmarks:    number of landmark nodes.
+        """
+        self.landmarks = Landmarks(self, number_of_landmarks)
+
     def calc_weights_time(
         self,
         edge,
@@ -226,32 +554,74 @@ class Graph_flow_model:
         number_of_neighbor_layers,
     ):
         """Function that retruns the weight of an arc"""
+        return self.calc_weights_edge(
+            edge,
+            vship,
+            WD_min,
+            WVPI,
+            self_f,
+            compute_cost,
+            compute_co2,
+            number_of_neighbor_layers,
+            speeds=[j],
+        )[0]
+
+    def calc_weights_edge(
+        self,
+        edge,
+        vship,
+        WD_min,
+        WVPI,
+        self_f,
+        compute_cost,
+        compute_co2,
+        number_of_neighbor_layers,
+        speeds=None,
+        aggregates=None,
+        mask=None,
+        ukc=None,
+    ):
+        """Function that returns the weights (L, W, euros, co2) of an edge for every
+        sailing velocity of vship (or for the indices in speeds), from a single evaluation
+        of halem.Functions.costfunction_series() for all sailing velocities. The flow
+        conditions of the edge can be given as aggregates
+        (output of halem.Functions.flow_aggregates()). The FIFO correction uses the
+        navigability mask of the vessel class, or Roadmap.mask if mask is None. The
+        under keel clearance is Roadmap.ukc if ukc is None."""
         from_node = edge[0]
-        W = (
-            Functions.costfunction_timeseries(
-                edge,
-                vship[j],
-                WD_min,
-                self_f,
-                WVPI,
-                number_of_neighbor_layers,
-                self_f.tria,
-            )
-            + self_f.t
+        if mask is None:
+            mask = self_f.mask
+        mask_from_node = mask[from_node]
+        if speeds == None:
+            speeds = range(len(vship))
+        W_series, L_series, _ = Functions.costfunction_series(
+            edge,
+            np.asarray(vship)[speeds],
+            WD_min,
+            self_f,
+            WVPI,
+            number_of_neighbor_layers,
+            self_f.tria,
+            self_f.edge_length[edge],
+            self_f.edge_heading[edge],
+            self_f.find_squat_table(vship, WD_min, WVPI, ukc),
+            aggregates,
+            ukc,
         )
-        W = self.FIFO_maker2(W, self_f.mask[from_node]) - self_f.t
 
-        L = Functions.costfunction_spaceseries(
-            edge, vship[j], WD_min, self_f, WVPI, number_of_neighbor_layers, self_f.tria
-        )
-        L = L + np.arange(len(L)) * (1 / len(L))
-        L = self.FIFO_maker2(L, self_f.mask[from_node]) - np.arange(len(L)) * (
-            1 / len(L)
-        )
-        euros = compute_cost(W, vship[j])
-        co2 = compute_co2(W, vship[j])
+        weights = []
+        for n, j in enumerate(speeds):
+            W = W_series[:, n] + self_f.t
+            W = self.FIFO_maker2(W, mask_from_node) - self_f.t
+
+            L = L_series[:, n]
+            L = L + np.arange(len(L)) * (1 / len(L))
+            L = self.FIFO_maker2(L, mask_from_node) - np.arange(len(L)) * (1 / len(L))
+            euros = compute_cost(W, vship[j])
+            co2 = compute_co2(W, vship[j])
+            weights.append((L, W, euros, co2))
 
-        return L, W, euros, co2
+        return weights
 
     def FIFO_maker2(self, y, N1):
         """Makes a FIFO time series from a Non-FIFO time series
@@ -274,6 +644,65 @@ class Graph_flow_model:
         return y_FIFO
 
 
+class Sailing_cost:
+    """Default cost function of the Roadmap, returns the costs of sailing an arc from the
+    travel time (s) and the sailing velocity (m/s). Module level class, so that a
+    Roadmap with the default functions can be saved (halem.Base_functions.save_object).
+
+    week_rate:  costs of the vessel per week
+    fuel_rate:  fuel costs per second for a sailing velocity of 1 m/s
+    """
+
+    def __init__(self, week_rate=700_000, fuel_rate=0.0008):
+        self.week_rate = week_rate
+        self.fuel_rate = fuel_rate
+
+    def __call__(self, travel_time, speed):
+        second_rate = self.week_rate / 7 / 24 / 60 / 60
+        return travel_time * second_rate + self.fuel_rate * travel_time * speed ** 3
+
+
+class Sailing_co2:
+    """Default emission function of the Roadmap, returns the emissions of sailing an arc
+    from the travel time (s) and the sailing velocity (m/s).
+
+    fuel_rate:  emissions per second for a sailing velocity of 1 m/s
+    """
+
+    def __init__(self, fuel_rate=1):
+        self.fuel_rate = fuel_rate
+
+    def __call__(self, travel_time, speed):
+        return self.fuel_rate * travel_time * speed ** 3
+
+
+def cost_functions(compute_cost=None, compute_co2=None):
+    """Returns the functions (compute_cost, compute_co2) of the costs and the emissions of
+    an arc from the travel time and the sailing velocity, the default functions
+    (Sailing_cost and Sailing_co2) for None."""
+    if compute_cost == None:
+        compute_cost = Sailing_cost()
+    if compute_co2 == None:
+        compute_co2 = Sailing_co2()
+    return compute_cost, compute_co2
+
+
+def speed_transition_allowed(i, j, speed_transitions="all", speed=None):
+    """True if the change from sailing velocity index i to index j is allowed.
+
+    speed_transitions:  None or 'all' for all changes, 'adjacent' for a change of at most
+                        one index
+    speed:              None, or the index of a fixed sailing velocity
+    """
+    if speed != None and (i != speed or j != speed):
+        return False
+    if speed_transitions == "adjacent":
+        return abs(i - j) <= 1
+    if speed_transitions in (None, "all"):
+        return True
+    raise ValueError("Unknown speed transitions: {}".format(speed_transitions))
+
+
 class Graph:
     """class that contains the nodes, arcs, and weights for the time-dependent, 
     directional, weighted, and Non-FIFO graph of the route optimization problem.
@@ -296,6 +725,501 @@ class Graph:
         self.edges[from_node].append(to_node)
         self.weights[(from_node, to_node)] = weight
 
+    def set_edge(self, from_node, to_node, weight):
+        """Adds the arc, or replaces the weight of the arc if the graph already has it."""
+        if (from_node, to_node) not in self.weights:
+            self.edges[from_node].append(to_node)
+        self.weights[(from_node, to_node)] = weight
+
+    def remove_edge(self, from_node, to_node):
+        """Removes the arc if the graph has it, a state without remaining arcs is removed
+        from the edges."""
+        if self.weights.pop((from_node, to_node), None) is None:
+            return
+        self.edges[from_node].remove(to_node)
+        if not self.edges[from_node]:
+            del self.edges[from_node]
+
+    def restricted_edges(self, speed_transitions=None, speed=None):
+        """Returns the edges with only the allowed transitions between the sailing
+        velocities (see halem.Mesh_maker.speed_transition_allowed()). The restricted
+        edges are stored in the Graph for the next queries."""
+        if speed_transitions in (None, "all") and speed == None:
+            return self.edges
+        restricted = self.__dict__.setdefault("restricted", {})
+        key = (speed_transitions, speed)
+        if key not in restricted:
+            restricted[key] = {}
+            for from_node, to_nodes in self.edges.items():
+                if speed != None and from_node[1] != speed:
+                    continue
+                to_nodes = [
+                    to_node
+                    for to_node in to_nodes
+                    if speed_transition_allowed(
+                        from_node[1], to_node[1], speed_transitions, speed
+                    )
+                ]
+                if to_nodes:
+                    restricted[key][from_node] = to_nodes
+        return restricted[key]
+
+
+class Navigability_mask:
+    """Bit-packed boolean (nodes x time steps) mask that is True where the water depth is
+    smaller than the given depth, which is the draft plus the under keel clearance of a
+    vessel class. Indexing (Roadmap.mask[idx]) returns the unpacked boolean rows like a
+    numpy array, with 1 bit instead of 1 byte per value in memory.
+
+    WD:     numpy array with the water depths, shape (nodes, time steps)
+    depth:  minimal navigable water depth in meters
+    """
+
+    def __init__(self, WD, depth):
+        WD = np.asarray(WD)
+        self.depth = depth
+        self.shape = WD.shape
+        self.bits = np.packbits(WD < depth, axis=-1)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def update(self, WD, nodes):
+        """Updates the mask of the nodes from the water depths WD (all nodes)."""
+        self.bits[nodes] = np.packbits(np.asarray(WD)[nodes] < self.depth, axis=-1)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, tuple):
+            return self[idx[0]][(Ellipsis,) + idx[1:]]
+        return np.unpackbits(self.bits[idx], axis=-1, count=self.shape[-1]).astype(bool)
+
+    def __array__(self, dtype=None, copy=None):
+        mask = self[:]
+        return mask if dtype == None else mask.astype(dtype)
+
+    def next_navigable(self, node, k, repeat=False):
+        """Returns the first time step from time step k at which the node is navigable,
+        or None if the node is not navigable anymore. With repeat the time steps are
+        repeated after the last time step."""
+        navigable = ~self[node]
+        if repeat == True:
+            navigable = np.concatenate([navigable[k:], navigable[:k]])
+            steps = np.flatnonzero(navigable)
+            return None if len(steps) == 0 else (k + steps[0]) % self.shape[-1]
+        steps = np.flatnonzero(navigable[k:])
+        return None if len(steps) == 0 else k + steps[0]
+
+    def navigable_windows(self, node):
+        """Returns the (start, stop) time steps of the periods in which the node is
+        navigable, stop is the first time step after the period."""
+        navigable = np.concatenate([[False], ~self[node], [False]])
+        changes = np.flatnonzero(navigable[1:] != navigable[:-1])
+        return list(zip(changes[::2], changes[1::2]))
+
+
+class Connectivity_index:
+    """Index of the nodes that can be connected by a route of a vessel class, for rejecting
+    queries without a route before the search. The index contains the (weakly) connected
+    components of the nodes over the arcs that are navigable at any time step, the time
+    steps at which an arc departs from a node, and the last time step at which an arc
+    arrives at a node. The arcs are navigable if the weight of any optimization type is
+    finite. The index only rejects queries that have no route, a query that is not
+    rejected can still have no route.
+
+    Roadmap:        Roadmap of the index (output of halem.Mesh_maker.Graph_flow_model)
+    vessel_class:   index of the vessel class (row of Roadmap.vship)
+    """
+
+    def __init__(self, Roadmap, vessel_class):
+        self.version = getattr(Roadmap, "version", 0)
+        self.repeat = Roadmap.repeat
+        n_nodes = len(Roadmap.nodes)
+        n_t = len(Roadmap.t)
+
+        navigable = {}
+        for weights in (
+            Roadmap.weight_time,
+            Roadmap.weight_space,
+            Roadmap.weight_cost,
+            Roadmap.weight_co2,
+        ):
+            if len(weights) <= vessel_class:
+                continue
+            for (from_state, to_state), W in weights[vessel_class].weights.items():
+                edge = (from_state[0], to_state[0])
+                finite = np.isfinite(np.asarray(W, dtype=float))
+                navigable[edge] = (
+                    navigable[edge] | finite if edge in navigable else finite
+                )
+
+        departures = np.zeros((n_nodes, n_t), dtype=bool)
+        self.last_arrival = np.full(n_nodes, -1)
+        edges = []
+        for (from_node, to_node), finite in navigable.items():
+            steps = np.flatnonzero(finite)
+            if len(steps) == 0:
+                continue
+            edges.append((from_node, to_node))
+            departures[from_node] |= finite
+            self.last_arrival[to_node] = max(self.last_arrival[to_node], steps[-1])
+        self.departures = np.packbits(departures, axis=-1)
+
+        edges = np.array(edges, dtype=int).reshape(-1, 2)
+        graph = scipy.sparse.coo_matrix(
+            (np.ones(len(edges)), (edges[:, 0], edges[:, 1])), shape=(n_nodes, n_nodes)
+        )
+        _, self.components = scipy.sparse.csgraph.connected_components(
+            graph, directed=True, connection="weak"
+        )
+
+    def can_depart(self, node, k):
+        """True if an arc departs from the node at time step k."""
+        return bool((self.departures[node, k // 8] >> (7 - k % 8)) & 1)
+
+    def feasible(self, start, stop, k):
+        """False if there is no route from the start node to the stop node that departs at
+        time step k."""
+        if start == stop:
+            return True
+        if self.components[start] != self.components[stop]:
+            return False
+        if not self.can_depart(start, k):
+            return False
+        if self.repeat != True and self.last_arrival[stop] < k:
+            return False
+        return self.last_arrival[stop] >= 0
+
+
+class Loading_condition:
+    """Weights of a vessel class for another draft and under keel clearance than the
+    Roadmap is made for. The weights are evaluated lazily, the first time the search
+    reaches an edge, and stored for the next queries. Edges on which the water depth is
+    never limiting use the weights of the Roadmap. The depth is not limiting above the
+    deep water depth, from which the sailing velocities (halem.Functions.Squat()) of the
+    loading condition and of the vessel class differ less than rtol, and both are
+    navigable.
+
+    The arcs are the arcs of the vessel class, arcs that are removed from the Roadmap
+    because they are never navigable for the vessel class (prune_edges) are not added.
+
+    Roadmap:        Roadmap (output of halem.Mesh_maker.Graph_flow_model)
+    vessel_class:   index of the vessel class (row of Roadmap.vship)
+    draft:          draft of the vessel in meters
+    ukc:            under keel clearance in meters
+    rtol:           relative difference of the sailing velocities below which the weights
+                    of the Roadmap are used
+    """
+
+    def __init__(self, Roadmap, vessel_class, draft, ukc, rtol=0.01):
+        self.Roadmap = Roadmap
+        self.vessel_class = vessel_class
+        self.draft = draft
+        self.ukc = ukc
+        self.vship = Roadmap.vship[vessel_class]
+        self.WVPI = Roadmap.WVPI[vessel_class]
+        self.mask = Navigability_mask(Roadmap.WD, draft + ukc)
+        self.lighter = draft + ukc < Roadmap.WD_min[vessel_class] + Roadmap.ukc
+
+        WD = Roadmap.WD[np.isfinite(Roadmap.WD)]
+        depths = np.linspace(0, WD.max(), 1000)[:, None]
+        with np.errstate(all="ignore"):
+            V = Functions.Squat(
+                depths,
+                draft,
+                self.vship[None, :],
+                Roadmap.LWL,
+                Roadmap.WWL,
+                ukc,
+                self.WVPI,
+            )
+            V_class = Functions.Squat(
+                depths,
+                Roadmap.WD_min[vessel_class],
+                self.vship[None, :],
+                Roadmap.LWL,
+                Roadmap.WWL,
+                Roadmap.ukc,
+                self.WVPI,
+            )
+            deep = (np.abs(V - V_class) <= rtol * V_class).all(axis=1)
+        limiting = np.flatnonzero(~deep)
+        if len(limiting) == 0:
+            self.deep_water = 0
+        elif limiting[-1] == len(depths) - 1:
+            self.deep_water = np.inf
+        else:
+            self.deep_water = depths[limiting[-1] + 1, 0]
+        self.deep_water = max(
+            self.deep_water, draft + ukc, Roadmap.WD_min[vessel_class] + Roadmap.ukc,
+        )
+
+        self.node_depth = Roadmap.WD.min(axis=1)
+        self.edge_weights = {}
+        self.weight_space = Lazy_weights(self, 0, Roadmap.weight_space)
+        self.weight_time = Lazy_weights(self, 1, Roadmap.weight_time)
+        self.weight_cost = Lazy_weights(self, 2, Roadmap.weight_cost)
+        self.weight_co2 = Lazy_weights(self, 3, Roadmap.weight_co2)
+
+    def limiting(self, edge):
+        """True if the water depth can limit the sailing on the edge."""
+        nodes = Functions.inbetweenpoints(
+            edge[0], edge[1], self.Roadmap.number_of_neighbor_layers, self.Roadmap.tria
+        )
+        return (
+            not self.node_depth[np.asarray(nodes, dtype=int)].min() >= self.deep_water
+        )
+
+    def find_weights(self, edge, reuse=True):
+        """Returns the weights (L, W, euros, co2) of the edge for every sailing velocity,
+        or None if the weights of the Roadmap are used (reuse)."""
+        if edge not in self.edge_weights:
+            self.edge_weights[edge] = None
+            if self.limiting(edge) == False and reuse == True:
+                return None
+        elif self.edge_weights[edge] != None or reuse == True:
+            return self.edge_weights[edge]
+        self.edge_weights[edge] = self.Roadmap.calc_weights_edge(
+            edge,
+            self.vship,
+            self.draft,
+            self.WVPI,
+            self.Roadmap,
+            *self.Roadmap.find_cost_functions(),
+            self.Roadmap.number_of_neighbor_layers,
+            mask=self.mask,
+            ukc=self.ukc,
+        )
+        return self.edge_weights[edge]
+
+
+class Lazy_weights(dict):
+    """Weights of a halem.Mesh_maker.Loading_condition for one optimization type, which
+    can be used as the weights of a halem.Mesh_maker.Graph. The weight of an arc is found
+    at the first lookup.
+
+    loading:    halem.Mesh_maker.Loading_condition
+    objective:  index of the optimization type in the weights (L, W, euros, co2)
+    graphs:     graphs of the optimization type of the Roadmap, for example
+                Roadmap.weight_time
+    """
+
+    def __init__(self, loading, objective, graphs):
+        super().__init__()
+        self.loading = loading
+        self.objective = objective
+        self.graphs = graphs
+
+    def __missing__(self, arc):
+        (from_node, _), (to_node, j) = arc
+        vessel_class = self.loading.vessel_class
+        reuse = len(self.graphs) > vessel_class
+        weights = self.loading.find_weights((from_node, to_node), reuse)
+        if weights == None:
+            weight = self.graphs[vessel_class].weights[arc]
+        else:
+            weight = weights[j][self.objective]
+        self[arc] = weight
+        return weight
+
+
+class Node_index:
+    """Spatial index (k-d tree) of the Roadmap nodes for snapping coordinates to the
+    nearest node. The distance is the Euclidean distance in degrees, as in
+    halem.Calc_path.Has_route.find_startstop(). For equal distances the node with
+    the lowest index is returned.
+
+    nodes:      numpy array with the coordinates of the nodes (Roadmap.nodes)
+    """
+
+    def __init__(self, nodes, number_of_candidates=8):
+        self.nodes = np.asarray(nodes, dtype=float)
+        self.tree = scipy.spatial.cKDTree(self.nodes)
+        self.number_of_candidates = min(number_of_candidates, len(self.nodes))
+
+    def distance(self, nodes, coordinates):
+        return (
+            (nodes[..., 1] - coordinates[..., 1]) ** 2
+            + (nodes[..., 0] - coordinates[..., 0]) ** 2
+        ) ** 0.5
+
+    def find_nodes(self, coordinates):
+        """Returns the index of the nearest node for every coordinate (array with shape
+        (N, 2)), or a single index for a single coordinate."""
+        coordinates = np.asarray(coordinates, dtype=float)
+        single = coordinates.ndim == 1
+        coordinates = np.atleast_2d(coordinates)
+
+        _, candidates = self.tree.query(coordinates, k=self.number_of_candidates)
+        candidates = candidates.reshape(len(coordinates), -1)
+        distances = self.distance(self.nodes[candidates], coordinates[:, None, :])
+
+        # The candidates are sorted on distance, ties are resolved on the lowest index
+        nearest = distances.min(axis=1)
+        tie = distances == nearest[:, None]
+        idx = np.where(tie, candidates, len(self.nodes)).min(axis=1)
+
+        # All candidates at the same distance, other nodes may be at that distance too
+        for i in np.flatnonzero(
+            tie.all(axis=1) & (candidates.shape[1] < len(self.nodes))
+        ):
+            nx = self.distance(self.nodes, coordinates[i])
+            idx[i] = np.argwhere(nx == nx.min())[0][0]
+
+        return int(idx[0]) if single else idx
+
+
+class Time_axis:
+    """Precomputed time axis of the Roadmap for the lookup of the time step of a
+    departure time in the route optimization. For a uniform time step the index is
+    calculated directly, otherwise it is found with bisection. Both give the same
+    index as halem.Calc_path.Has_route.find_k_time() and find_k_repeat().
+
+    t:          numpy array with the time steps of the Roadmap (Roadmap.t)
+    repeat:     True for a repeated Roadmap, the departure time is reduced to the
+                phase of the period in the same way as in find_k_repeat()
+    """
+
+    def __init__(self, t, repeat=False):
+        t = np.asarray(t, dtype=float)
+        self.repeat = repeat
+        if repeat == True:
+            t = t - t[0]
+            self.period = t[-1]
+        self.ts = t.tolist()
+        self.n = len(t)
+
+        dt = np.diff(t)
+        self.uniform = self.n > 1 and bool(np.all(np.abs(dt - dt[0]) <= 1e-9 * dt[0]))
+        self.t0 = self.ts[0]
+        self.dt = float(dt[0]) if self.uniform else None
+
+    def find_k(self, t):
+        """Returns the index of the time step nearest to t, the first index for a tie."""
+        if self.repeat == True:
+            if t == np.inf:
+                return self.n - 1
+            N = int(t / self.period)
+            t = t - N * self.period
+        elif t == np.inf or t == -np.inf:
+            return 0
+        if self.n == 1:
+            return 0
+
+        if self.uniform:
+            k = min(max(int((t - self.t0) / self.dt + 0.5), 0), self.n - 1)
+            low = max(k - 1, 0)
+            high = min(k + 1, self.n - 1)
+        else:
+            k = bisect.bisect_left(self.ts, t)
+            low = max(k - 1, 0)
+            high = min(k, self.n - 1)
+
+        ts = self.ts
+        k = low
+        for i in range(low + 1, high + 1):
+            if abs(ts[i] - t) < abs(ts[k] - t):
+                k = i
+        return k
+
+    def find_k_array(self, t):
+        """Returns Time_axis.find_k() for every time in the numpy array t."""
+        t = np.asarray(t, dtype=float)
+        ts = np.array(self.ts)
+        if self.repeat == True:
+            with np.errstate(invalid="ignore"):
+                t = t - np.trunc(t / self.period) * self.period
+        if self.n == 1:
+            return np.zeros(t.shape, dtype=int)
+
+        high = np.clip(np.searchsorted(ts, t), 1, self.n - 1)
+        low = high - 1
+        k = np.where(np.abs(ts[high] - t) < np.abs(ts[low] - t), high, low)
+        if self.repeat == True:
+            k[np.isnan(t)] = self.n - 1
+        else:
+            k[np.isinf(t)] = 0
+        return k
+
+
+class Landmarks:
+    """Landmark (ALT) lower bounds for the time optimization. For every vessel class
+    a static graph is made with the minimum over time of the weights of every arc.
+    The travel times in this graph from and to a set of landmark nodes are lower bounds
+    of the time dependent travel times, with the triangle inequality they give a lower
+    bound of the sailing time from any node to the destination.
+
+    Roadmap:                Roadmap with the time weights (halem.Mesh_maker.Graph_flow_model)
+    number_of_landmarks:    number of landmark nodes. The landmarks are selected with the
+                            farthest point method on the nodes that have arcs.
+    """
+
+    def __init__(self, Roadmap, number_of_landmarks):
+        self.nodes = self.select_landmarks(Roadmap, number_of_landmarks)
+        self.from_landmarks = []
+        self.to_landmarks = []
+
+        for graph_time in Roadmap.weight_time:
+            G = self.lower_bound_graph(len(Roadmap.nodes), graph_time)
+            self.from_landmarks.append(
+                scipy.sparse.csgraph.dijkstra(G, indices=self.nodes)
+            )
+            self.to_landmarks.append(
+                scipy.sparse.csgraph.dijkstra(G.T.tocsr(), indices=self.nodes)
+            )
+
+    def select_landmarks(self, Roadmap, number_of_landmarks):
+        """Farthest point selection of the landmark nodes."""
+        active = np.unique([state[0] for state in Roadmap.graph.edges])
+        coords = Roadmap.nodes[active]
+        distance = Functions.haversine_array(coords, coords.mean(axis=0))
+
+        landmarks = []
+        for _ in range(min(number_of_landmarks, len(active))):
+            new = int(np.argmax(distance))
+            landmarks.append(active[new])
+            distance = np.minimum(
+                distance, Functions.haversine_array(coords, coords[new])
+            )
+        return np.array(landmarks, dtype=int)
+
+    def lower_bound_graph(self, number_of_nodes, graph):
+        """Returns a sparse matrix with the minimum weight over time and speed
+        for every pair of connected nodes."""
+        W_min = {}
+        for edge, W in graph.weights.items():
+            key = (edge[0][0], edge[1][0])
+            W = W.min()
+            if W < W_min.get(key, np.inf):
+                W_min[key] = W
+
+        from_nodes = np.array([key[0] for key in W_min], dtype=int)
+        to_nodes = np.array([key[1] for key in W_min], dtype=int)
+        W = np.array([W_min[key] for key in W_min], dtype=float)
+        return scipy.sparse.csr_matrix(
+            (W, (from_nodes, to_nodes)), shape=(number_of_nodes, number_of_nodes)
+        )
+
+    def lower_bound(self, stop, vessel_class, nodes=None):
+        """Returns for every node the ALT lower bound of the sailing time to the stop node.
+
+        stop:           index of the destination node
+        vessel_class:   index of the vessel class (row of Roadmap.vship)
+        nodes:          None for all nodes, or the indices of the nodes of the bounds
+        """
+        d_from = self.from_landmarks[vessel_class]
+        d_to = self.to_landmarks[vessel_class]
+        if nodes is None:
+            nodes = slice(None)
+
+        with np.errstate(invalid="ignore"):
+            LB = np.fmax(
+                d_from[:, stop][:, None] - d_from[:, nodes],
+                d_to[:, nodes] - d_to[:, stop][:, None],
+            )
+        LB = np.fmax.reduce(LB, axis=0)
+        LB[np.isnan(LB)] = 0
+        return np.maximum(LB, 0)
+
 
 class node_reduction:
     """ This class can reduce the number of gridpoints of the hydrodynamic model. This is done 
@@ -280,3 +280,749 @@ def test_plot():
 
     path, time, _ = halem.HALEM_co2(start[::-1], stop[::-1], t0, vmax, Roadmap2)
     halem.plot_timeseries2(path, time, Roadmap2, Color="r")
+
+
+def test_HALEM_time_geodesic():
+    start = (0.0001, 0.0001)
+    stop = (0.0001, 0.003001)
+    t0 = "17/05/2019 9:18:15"
+    vmax = 5
+
+    path, time, _ = halem.HALEM_time(start[::-1], stop[::-1], t0, vmax, Roadmap)
+    path_a, time_a, _ = halem.HALEM_time(
+        start[::-1], stop[::-1], t0, vmax, Roadmap, heuristic="geodesic"
+    )
+    np.testing.assert_array_equal(path, path_a)
+    np.testing.assert_array_equal(time, time_a)
+
+    path, _, _ = halem.HALEM_space(start[::-1], stop[::-1], t0, vmax, Roadmap)
+    path_a, _, _ = halem.HALEM_space(
+        start[::-1], stop[::-1], t0, vmax, Roadmap, heuristic="geodesic"
+    )
+    np.testing.assert_array_equal(path, path_a)
+
+    with pytest.raises(ValueError):
+        halem.HALEM_cost(
+            start[::-1], stop[::-1], t0, vmax, Roadmap, heuristic="geodesic"
+        )
+
+
+def test_lower_bound_geodesic():
+    class graph_functions_time:
+        weights = Roadmap.weight_time[1].weights
+        time = Roadmap.weight_time[1].weights
+        vship = Roadmap.vship[1]
+
+    LB = Calc_path.Has_route.lower_bound_geodesic(
+        Calc_path.Has_route, Roadmap, 3, graph_functions_time
+    )
+    assert LB[3] == 0
+    for edge, W in Roadmap.weight_time[1].weights.items():
+        if edge[1][0] == 3:
+            assert LB[edge[0][0]] <= W.min()
+
+
+def test_HALEM_time_landmarks():
+    start = (0.0001, 0.0001)
+    stop = (0.0001, 0.003001)
+    t0 = "17/05/2019 9:18:15"
+    vmax = 5
+
+    Roadmap.compute_landmarks(2)
+    assert len(Roadmap.landmarks.nodes) == 2
+    assert Roadmap.landmarks.from_landmarks[0].shape == (2, len(Roadmap.nodes))
+
+    LB = Roadmap.landmarks.lower_bound(3, 1)
+    assert LB[3] == 0
+    for edge, W in Roadmap.weight_time[1].weights.items():
+        if edge[1][0] == 3:
+            assert LB[edge[0][0]] <= W.min()
+    np.testing.assert_array_equal(
+        Roadmap.landmarks.lower_bound(3, 1, [2, 0]), LB[[2, 0]]
+    )
+
+    path, time, _ = halem.HALEM_time(start[::-1], stop[::-1], t0, vmax, Roadmap)
+    path_a, time_a, _ = halem.HALEM_time(
+        start[::-1], stop[::-1], t0, vmax, Roadmap, heuristic="landmarks"
+    )
+    np.testing.assert_array_equal(path, path_a)
+    np.testing.assert_array_equal(time, time_a)
+
+    with pytest.raises(ValueError):
+        halem.HALEM_time(
+            start[::-1], stop[::-1], t0, vmax, Roadmap2, heuristic="landmarks"
+        )
+
+
+def test_HALEM_one_to_many():
+    t0 = "17/05/2019 9:18:15"
+    vmax = 5
+    nodes = Roadmap.nodes[:, ::-1]
+
+    times, costs, paths = halem.HALEM_one_to_many(
+        nodes[0], nodes, t0, vmax, Roadmap, Roadmap.weight_cost, return_paths=True
+    )
+    assert times.shape == costs.shape == (len(nodes),)
+    for stop, T, C, output in zip(nodes, times, costs, paths):
+        path, time, dist = halem.HALEM_cost(nodes[0], stop, t0, vmax, Roadmap)
+        assert T == time[-1]
+        np.testing.assert_array_equal(output[0], path)
+        np.testing.assert_array_equal(output[1], time)
+        np.testing.assert_array_equal(output[2], dist)
+
+    times_m, costs_m = halem.HALEM_many_to_many(
+        nodes[:2], nodes, t0, vmax, Roadmap, Roadmap.weight_cost
+    )
+    assert times_m.shape == costs_m.shape == (2, len(nodes))
+    np.testing.assert_array_equal(times_m[0], times)
+    np.testing.assert_array_equal(costs_m[0], costs)
+
+
+def test_HALEM_profile():
+    start = (0.0001, 0.0001)
+    stop = (0.0001, 0.003001)
+    vmax = 5
+
+    def to_string(t):
+        return datetime.datetime.fromtimestamp(t).strftime("%d/%m/%Y %H:%M:%S")
+
+    for R in (Roadmap, Roadmap2):
+        departures, arrivals = halem.HALEM_profile(
+            start[::-1], stop[::-1], to_string(R.t[2]), to_string(R.t[40]), vmax, R
+        )
+        np.testing.assert_array_equal(departures, R.t[2:41])
+        for t0, arrival in zip(departures, arrivals):
+            _, time, _ = halem.HALEM_time(
+                start[::-1], stop[::-1], to_string(t0), vmax, R
+            )
+            assert arrival == time[-1]
+
+    departures, arrivals = halem.HALEM_profile(
+        start[::-1],
+        stop[::-1],
+        to_string(Roadmap.t[-1] + 10),
+        to_string(Roadmap.t[-1] + 20),
+        vmax,
+        Roadmap,
+    )
+    assert len(departures) == 0
+    assert len(arrivals) == 0
+
+
+def test_HALEM_batch():
+    t0 = "17/05/2019 9:18:15"
+    nodes = Roadmap.nodes[:, ::-1]
+    starts = np.repeat(nodes, len(nodes), axis=0)
+    stops = np.tile(nodes, (len(nodes), 1))
+    vmax = np.where(np.arange(len(starts)) % 2 == 0, 4, 5)
+
+    for processes in (1, 2):
+        routes = halem.HALEM_batch(
+            starts,
+            stops,
+            t0,
+            vmax,
+            Roadmap,
+            Roadmap.weight_time,
+            processes=processes,
+            chunksize=3,
+        )
+        for start, stop, v, route in zip(starts, stops, vmax, routes):
+            if route is None:
+                with pytest.raises(ValueError):
+                    halem.HALEM_time(start, stop, t0, v, Roadmap)
+                continue
+            path, time, dist = halem.HALEM_time(start, stop, t0, v, Roadmap)
+            np.testing.assert_array_equal(route[0], path)
+            np.testing.assert_array_equal(route[1], time)
+            np.testing.assert_array_equal(route[2], dist)
+
+    with pytest.raises(ValueError):
+        next(halem.HALEM_batch(starts, stops, t0, 5, Roadmap, Roadmap.weight_time[0]))
+
+    with pytest.raises(ValueError):
+        next(
+            halem.HALEM_batch(
+                starts,
+                stops,
+                t0,
+                5,
+                Roadmap,
+                Roadmap.weight_time,
+                processes=1,
+                heuristic="unknown",
+            )
+        )
+
+    batch = halem.HALEM_batch(
+        starts, stops, t0, vmax, Roadmap, Roadmap.weight_time, processes=1
+    )
+    batch2 = halem.HALEM_batch(
+        starts, stops, t0, vmax, Roadmap2, Roadmap2.weight_time, processes=1
+    )
+    routes = [next(batch)]
+    routes2 = list(batch2)
+    routes.extend(batch)
+    assert len(routes) == len(routes2) == len(starts)
+    for start, stop, v, route in zip(starts, stops, vmax, routes):
+        if route is None:
+            with pytest.raises(Calc_path.No_route_found):
+                halem.HALEM_time(start, stop, t0, v, Roadmap)
+            continue
+        np.testing.assert_array_equal(
+            route[1], halem.HALEM_time(start, stop, t0, v, Roadmap)[1]
+        )
+
+
+def test_HALEM_time_pruning():
+    start = (0.0001, 0.0001)
+    stop = (0.0001, 0.003001)
+    t0 = "17/05/2019 9:18:15"
+    vmax = 5
+
+    path, time, _ = halem.HALEM_time(start[::-1], stop[::-1], t0, vmax, Roadmap)
+    for kwargs in (
+        {"corridor": 1.5},
+        {"buffer": 200},
+        {"bound": time[-1] - time[0]},
+        {"corridor": 1.5, "heuristic": "geodesic", "bound": time[-1] - time[0]},
+    ):
+        path_p, time_p, _ = halem.HALEM_time(
+            start[::-1], stop[::-1], t0, vmax, Roadmap, **kwargs
+        )
+        np.testing.assert_array_equal(path, path_p)
+        np.testing.assert_array_equal(time, time_p)
+
+    allowed = Calc_path.Has_route.corridor_nodes(
+        Calc_path.Has_route, Roadmap, 0, 3, buffer=10
+    )
+    assert [allowed[node] for node in range(4)] == [True, True, False, True]
+    allowed = Calc_path.Has_route.corridor_nodes(
+        Calc_path.Has_route, Roadmap, 0, 3, corridor=1.01
+    )
+    assert [allowed[node] for node in range(4)] == [True, True, False, True]
+
+    with pytest.raises(ValueError):
+        halem.HALEM_time(
+            start[::-1], stop[::-1], t0, vmax, Roadmap, bound=time[-1] - time[0] - 1
+        )
+
+
+def test_Route_cache():
+    start = (0.0001, 0.0001)
+    stop = (0.0001, 0.003001)
+    t0 = "17/05/2019 9:18:15"
+    t1 = datetime.datetime.fromtimestamp(Roadmap.t[10]).strftime("%d/%m/%Y %H:%M:%S")
+    vmax = 5
+
+    cache = halem.Route_cache(Roadmap, maxsize=2)
+    for t in (t0, t1):
+        path, time, dist = halem.HALEM_time(start[::-1], stop[::-1], t, vmax, Roadmap)
+        path_c, time_c, dist_c = cache.HALEM_time(start[::-1], stop[::-1], t, vmax)
+        np.testing.assert_array_equal(path, path_c)
+        np.testing.assert_array_equal(time, time_c)
+        np.testing.assert_array_equal(dist, dist_c)
+    assert cache.info() == {"hits": 0, "misses": 2, "maxsize": 2, "size": 2}
+
+    cache.HALEM_time(start[::-1], stop[::-1], t0, vmax)
+    cache.HALEM_time(start[::-1], stop[::-1], "17/05/2019 9:18:25", vmax + 0.1)
+    assert cache.info()["hits"] == 2
+    cache.HALEM_time(start[::-1], stop[::-1], t0, vmax, heuristic="geodesic")
+    cache.HALEM_space(start[::-1], stop[::-1], t0, vmax)
+    assert cache.info() == {"hits": 2, "misses": 4, "maxsize": 2, "size": 2}
+
+    Roadmap.version += 1
+    cache.HALEM_space(start[::-1], stop[::-1], t0, vmax)
+    Roadmap.version -= 1
+    assert cache.info()["misses"] == 5
+    assert cache.info()["size"] == 1
+
+    for _ in range(2):
+        result = cache.HALEM_space(
+            start[::-1], stop[::-1], t0, vmax, return_result=True
+        )
+    assert cache.info()["hits"] == 3
+    np.testing.assert_array_equal(
+        result.time,
+        halem.HALEM_space(
+            start[::-1], stop[::-1], t0, vmax, Roadmap, return_result=True
+        ).time,
+    )
+
+    class flow_dry:
+        def __init__(self, name="maaktnietuit"):
+            self.t = np.arange(0, 100) * 60 + 1558077464
+            self.nodes = np.array([(0, 0), (0, 0.001), (0.001, 0.001), (0, 0.003)])
+            self.tria = Delaunay(self.nodes)
+            self.WD = np.ones((len(self.t), len(self.nodes))) * 100
+            self.WD[50:, 3] = 3
+            self.u = np.zeros((len(self.t), len(self.nodes)))
+            self.v = np.zeros((len(self.t), len(self.nodes)))
+
+    Roadmap_dry = Mesh_maker.Graph_flow_model(
+        name_textfile_flow,
+        dx_min,
+        blend,
+        nl,
+        number_of_neighbor_layers,
+        vship,
+        flow_dry,
+        np.array([1, 5]),
+        WVPI,
+        ukc=0,
+    )
+    clear_output()
+    cache = halem.Route_cache(Roadmap_dry)
+
+    def departure(seconds):
+        t = datetime.datetime.fromtimestamp(Roadmap_dry.t[0] + seconds)
+        return t.strftime("%d/%m/%Y %H:%M:%S")
+
+    # Departures in the time step 20 (1170 s to 1230 s), the last leg of the route
+    # departs in time step 21 for the later departure times
+    for seconds, misses in ((1171, 1), (1175, 1), (1225, 2), (1228, 2)):
+        path_c, time_c, dist_c = cache.HALEM_time(
+            start[::-1], stop[::-1], departure(seconds), vmax
+        )
+        path, time, dist = halem.HALEM_time(
+            start[::-1], stop[::-1], departure(seconds), vmax, Roadmap_dry
+        )
+        np.testing.assert_array_equal(path, path_c)
+        np.testing.assert_array_equal(time, time_c)
+        assert cache.info()["misses"] == misses
+
+    # The last leg departs when the destination has fallen dry
+    cache.HALEM_time(start[::-1], stop[::-1], departure(2911), vmax)
+    with pytest.raises(Calc_path.No_route_found):
+        cache.HALEM_time(start[::-1], stop[::-1], departure(2960), vmax)
+
+
+def test_HALEM_pareto():
+    start = (0.0001, 0.0001)
+    stop = (0.0001, 0.003001)
+    t0 = "17/05/2019 9:18:15"
+    vmax = 5
+
+    values, paths = halem.HALEM_pareto(
+        start[::-1], stop[::-1], t0, vmax, Roadmap, ["time", "co2"], epsilon=0
+    )
+    assert values.shape == (len(paths), 2)
+    assert (np.diff(values[:, 0]) >= 0).all()
+    for i in range(len(values)):
+        for j in range(len(values)):
+            assert i == j or not (values[i] <= values[j]).all()
+
+    # Several labels per state can give a faster route than the time dependent Dijkstra
+    path, time, dist = halem.HALEM_time(start[::-1], stop[::-1], t0, vmax, Roadmap)
+    assert values[0, 0] == paths[0][1][-1] - paths[0][1][0]
+    assert values[0, 0] <= time[-1] - time[0]
+    _, co2 = halem.HALEM_one_to_many(
+        start[::-1], [stop[::-1]], t0, vmax, Roadmap, Roadmap.weight_co2
+    )
+    assert values[:, 1].min() <= co2[0]
+
+    values_1, paths_1 = halem.HALEM_pareto(
+        start[::-1],
+        stop[::-1],
+        t0,
+        vmax,
+        Roadmap,
+        ["time", "co2"],
+        max_routes=1,
+        epsilon=0,
+    )
+    np.testing.assert_array_equal(values_1, values[:1])
+    for epsilon in (0.01, 0.5):
+        values_e, _ = halem.HALEM_pareto(
+            start[::-1], stop[::-1], t0, vmax, Roadmap, ["time", "co2"], epsilon=epsilon
+        )
+        assert 1 <= len(values_e) <= len(values)
+
+    for objectives in (["space"], ["space", "co2"]):
+        values_s, paths_s = halem.HALEM_pareto(
+            start[::-1], stop[::-1], t0, vmax, Roadmap, objectives
+        )
+        assert len(values_s) == len(paths_s) >= 1
+        for i in range(len(values_s)):
+            for j in range(len(values_s)):
+                assert i == j or not (values_s[i] <= values_s[j]).all()
+    values_s, _ = halem.HALEM_pareto(
+        start[::-1], stop[::-1], t0, vmax, Roadmap, ["space"]
+    )
+    assert len(values_s) == 1
+
+    rng = np.random.default_rng(0)
+    for n_criteria in (2, 3):
+        labels = sorted(map(tuple, rng.integers(0, 20, (50, n_criteria)).tolist()))
+        bag = Calc_path.Label_bag(n_criteria)
+        for size, criteria in enumerate(labels):
+            for bound in rng.integers(0, 20, (10, n_criteria)).tolist():
+                dominated = any(
+                    all(a <= b for a, b in zip(other, bound)) for other in labels[:size]
+                )
+                assert bag.dominated(bound) == dominated
+            bag.append(criteria)
+
+
+def test_Search_statistics():
+    start = (0.0001, 0.0001)
+    stop = (0.0001, 0.003001)
+    t0 = "17/05/2019 9:18:15"
+    vmax = 5
+
+    statistics = Calc_path.Search_statistics()
+    path, time, _ = halem.HALEM_time(start[::-1], stop[::-1], t0, vmax, Roadmap)
+    path_s, time_s, _ = halem.HALEM_time(
+        start[::-1], stop[::-1], t0, vmax, Roadmap, statistics=statistics
+    )
+    np.testing.assert_array_equal(path, path_s)
+    np.testing.assert_array_equal(time, time_s)
+
+    assert statistics.queries == 1
+    assert 0 < statistics.settled == statistics.time_lookups
+    assert statistics.relaxed >= statistics.settled
+    assert statistics.heap_pushes >= statistics.heap_pops > statistics.settled
+    assert statistics.time_search > 0
+    assert statistics.time_reconstruction > 0
+
+    batch = Calc_path.Search_statistics()
+    routes = list(
+        halem.HALEM_batch(
+            [start[::-1]] * 3,
+            [stop[::-1]] * 3,
+            t0,
+            vmax,
+            Roadmap,
+            Roadmap.weight_time,
+            processes=2,
+            statistics=batch,
+        )
+    )
+    np.testing.assert_array_equal(routes[2][1], time)
+    assert batch.queries == 3
+    assert batch.settled == 3 * statistics.settled
+    assert batch.heap_pushes == 3 * statistics.heap_pushes
+
+    total = Calc_path.Search_statistics().add(statistics).add(batch)
+    assert total.as_dict()["relaxed"] == 4 * statistics.relaxed
+
+
+def test_HALEM_speed_transitions():
+    start = (0.0001, 0.0001)
+    stop = (0.0001, 0.003001)
+    t0 = "17/05/2019 9:18:15"
+    vmax = 6
+    vship3 = np.array([[3, 4, 5], [4, 5, 6]])
+
+    Roadmap_all = Mesh_maker.Graph_flow_model(
+        name_textfile_flow,
+        dx_min,
+        blend,
+        nl,
+        number_of_neighbor_layers,
+        vship3,
+        Load_flow,
+        WD_min,
+        WVPI,
+    )
+    Roadmap_adjacent = Mesh_maker.Graph_flow_model(
+        name_textfile_flow,
+        dx_min,
+        blend,
+        nl,
+        number_of_neighbor_layers,
+        vship3,
+        Load_flow,
+        WD_min,
+        WVPI,
+        speed_transitions="adjacent",
+    )
+    clear_output()
+    assert len(Roadmap_adjacent.graph.weights) < len(Roadmap_all.graph.weights)
+    for from_node, to_nodes in Roadmap_adjacent.weight_time[1].edges.items():
+        assert all(abs(from_node[1] - to_node[1]) <= 1 for to_node in to_nodes)
+
+    path, time, dist = halem.HALEM_time(
+        start[::-1], stop[::-1], t0, vmax, Roadmap_adjacent
+    )
+    path_q, time_q, dist_q = halem.HALEM_time(
+        start[::-1], stop[::-1], t0, vmax, Roadmap_all, speed_transitions="adjacent"
+    )
+    np.testing.assert_array_equal(path, path_q)
+    np.testing.assert_array_equal(time, time_q)
+    np.testing.assert_array_equal(dist, dist_q)
+
+    graph_functions = halem.find_graph_functions(
+        vmax, Roadmap_all, Roadmap_all.weight_time, speed=2
+    )
+    route = Calc_path.Has_route(start, stop, Roadmap_all, t0, graph_functions).route
+    assert (route[:, 3] == 2).all()
+    _, time_f, _ = halem.HALEM_time(
+        start[::-1], stop[::-1], t0, vmax, Roadmap_all, speed=2
+    )
+    np.testing.assert_array_equal(time_f, route[:, 1])
+
+    with pytest.raises(ValueError):
+        Mesh_maker.speed_transition_allowed(0, 1, "unknown")
+
+
+def test_Route_result():
+    start = (0.0001, 0.0001)
+    stop = (0.0001, 0.003001)
+    t0 = "17/05/2019 9:18:15"
+    vmax = 5
+
+    path, time, dist = halem.HALEM_time(start[::-1], stop[::-1], t0, vmax, Roadmap)
+    result = halem.HALEM_time(
+        start[::-1], stop[::-1], t0, vmax, Roadmap, return_result=True
+    )
+    np.testing.assert_array_equal(result.path, path)
+    np.testing.assert_array_equal(result.time, time)
+    np.testing.assert_array_equal(result.dist[1:], dist)
+    np.testing.assert_array_equal(result.leg_time, np.diff(time))
+    np.testing.assert_allclose(result.weight, time - time[0])
+    assert result.dist[0] == 0
+    assert len(result.speed) == len(path) - 1
+    np.testing.assert_array_equal(result.vship, Roadmap.vship[1][result.speed])
+
+    D = 0
+    for i in range(len(path) - 1):
+        D = D + Functions.haversine(path[i, ::-1], path[i + 1, ::-1])
+        np.testing.assert_allclose(result.dist[i + 1], D)
+
+    states = list(zip(Roadmap.find_nodes(path[:, ::-1]), [0, *result.speed]))
+    graph_functions = halem.find_graph_functions(vmax, Roadmap, Roadmap.weight_co2)
+    route_co2 = Calc_path.Has_route.evaluate_route(
+        Calc_path.Has_route, Roadmap, states, time[0], graph_functions
+    )
+    np.testing.assert_allclose(result.co2, np.array(route_co2)[:, 2])
+    assert result.cost[-1] > 0
+
+
+def test_Connectivity_index():
+    class flow_dry:
+        def __init__(self, name="maaktnietuit"):
+            self.t = np.arange(0, 100) * 60 + 1558077464
+            self.nodes = np.array([(0, 0), (0, 0.001), (0.001, 0.001), (0, 0.003)])
+            self.tria = Delaunay(self.nodes)
+            self.WD = np.ones((len(self.t), len(self.nodes))) * 100
+            self.WD[:, 2] = 3
+            self.WD[50:, 3] = 3
+            self.u = np.zeros((len(self.t), len(self.nodes)))
+            self.v = np.zeros((len(self.t), len(self.nodes)))
+
+    Roadmap_dry = Mesh_maker.Graph_flow_model(
+        name_textfile_flow,
+        dx_min,
+        blend,
+        nl,
+        number_of_neighbor_layers,
+        vship,
+        flow_dry,
+        np.array([1, 5]),
+        WVPI,
+        ukc=0,
+    )
+    clear_output()
+    index = Roadmap_dry.find_connectivity(1)
+    assert index is Roadmap_dry.find_connectivity(1)
+    assert index.components[2] != index.components[0]
+    assert index.components[3] == index.components[0]
+    assert index.feasible(0, 3, 10)
+    assert not index.feasible(0, 2, 10)
+    assert not index.feasible(0, 3, 80)
+    assert Roadmap_dry.find_connectivity(0).feasible(0, 2, 10)
+
+    start = (0.0001, 0.0001)
+    stop = (0.0001, 0.003001)
+    t_early = datetime.datetime.fromtimestamp(Roadmap_dry.t[10])
+    t_late = datetime.datetime.fromtimestamp(Roadmap_dry.t[80])
+    halem.HALEM_time(
+        start[::-1], stop[::-1], t_early.strftime("%d/%m/%Y %H:%M:%S"), 5, Roadmap_dry
+    )
+    statistics = Calc_path.Search_statistics()
+    with pytest.raises(ValueError):
+        halem.HALEM_time(
+            start[::-1],
+            stop[::-1],
+            t_late.strftime("%d/%m/%Y %H:%M:%S"),
+            5,
+            Roadmap_dry,
+            statistics=statistics,
+        )
+    assert statistics.queries == 1
+    assert statistics.settled == 0
+
+    Roadmap_dry.version += 1
+    assert Roadmap_dry.find_connectivity(1) is not index
+
+
+def test_Exclusion_zone():
+    start = (0.0001, 0.0001)
+    stop = (0.0001, 0.003001)
+    t0 = "17/05/2019 9:18:15"
+    vmax = 5
+    polygon = np.array(
+        [(0.0008, 0.0008), (0.0012, 0.0008), (0.0012, 0.0012), (0.0008, 0.0012)]
+    )
+
+    zone = Calc_path.Exclusion_zone(polygon)
+    edges = zone.find_edges(Roadmap)
+    assert edges is zone.find_edges(Roadmap)
+    assert all(2 in edge for edge in edges)
+    assert (0, 2) in edges and (2, 3) in edges
+
+    path, time, _ = halem.HALEM_time(start[::-1], stop[::-1], t0, vmax, Roadmap)
+    path_z, time_z, _ = halem.HALEM_time(
+        start[::-1], stop[::-1], t0, vmax, Roadmap, exclusion_zones=[zone]
+    )
+    assert [0.001, 0.001] in path.tolist()
+    assert [0.001, 0.001] not in path_z.tolist()
+    assert time_z[-1] > time[-1]
+
+    zone_later = Calc_path.Exclusion_zone(
+        polygon, "17/05/2019 10:00:00", "17/05/2019 11:00:00"
+    )
+    path_l, time_l, _ = halem.HALEM_time(
+        start[::-1], stop[::-1], t0, vmax, Roadmap, exclusion_zones=[zone_later]
+    )
+    np.testing.assert_array_equal(path_l, path)
+    np.testing.assert_array_equal(time_l, time)
+
+    zone_now = Calc_path.Exclusion_zone(
+        polygon, "17/05/2019 9:18:30", "17/05/2019 11:00:00"
+    )
+    path_n, _, _ = halem.HALEM_time(
+        start[::-1], stop[::-1], t0, vmax, Roadmap, exclusion_zones=[zone_now]
+    )
+    np.testing.assert_array_equal(path_n, path_z)
+
+    with pytest.raises(ValueError):
+        halem.HALEM_time(
+            start[::-1],
+            stop[::-1],
+            t0,
+            vmax,
+            Roadmap,
+            exclusion_zones=[Calc_path.Exclusion_zone(polygon + [0.002, -0.001])],
+        )
+
+
+def test_Loading_condition():
+    class flow_dry:
+        def __init__(self, name="maaktnietuit"):
+            self.t = np.arange(0, 100) * 60 + 1558077464
+            self.nodes = np.array([(0, 0), (0, 0.001), (0.001, 0.001), (0, 0.003)])
+            self.tria = Delaunay(self.nodes)
+            self.WD = np.ones((len(self.t), len(self.nodes))) * 100
+            self.WD[50:, 3] = 3
+            self.u = np.zeros((len(self.t), len(self.nodes)))
+            self.v = np.zeros((len(self.t), len(self.nodes)))
+
+    Roadmap_dry = Mesh_maker.Graph_flow_model(
+        name_textfile_flow,
+        dx_min,
+        blend,
+        nl,
+        number_of_neighbor_layers,
+        vship,
+        flow_dry,
+        np.array([1, 5]),
+        WVPI,
+        ukc=0,
+    )
+    clear_output()
+    start = (0.0001, 0.0001)
+    stop = (0.0001, 0.003001)
+    t_early = datetime.datetime.fromtimestamp(Roadmap_dry.t[10])
+    t_early = t_early.strftime("%d/%m/%Y %H:%M:%S")
+    t_late = datetime.datetime.fromtimestamp(Roadmap_dry.t[80])
+    t_late = t_late.strftime("%d/%m/%Y %H:%M:%S")
+
+    path, time, dist = halem.HALEM_time(
+        start[::-1], stop[::-1], t_early, 5, Roadmap_dry
+    )
+    path_d, time_d, dist_d = halem.HALEM_time(
+        start[::-1], stop[::-1], t_early, 5, Roadmap_dry, draft=5, ukc=0
+    )
+    np.testing.assert_array_equal(path_d, path)
+    np.testing.assert_array_equal(time_d, time)
+
+    loading = Roadmap_dry.find_loading(1, 5, 0)
+    assert loading is Roadmap_dry.find_loading(1, 5.0)
+    for arc, W in Roadmap_dry.weight_time[1].weights.items():
+        np.testing.assert_array_equal(loading.weight_time[arc], W)
+        np.testing.assert_array_equal(
+            loading.weight_cost[arc], Roadmap_dry.weight_cost[1].weights[arc]
+        )
+
+    with pytest.raises(ValueError):
+        halem.HALEM_time(start[::-1], stop[::-1], t_late, 5, Roadmap_dry)
+    path_l, time_l, _ = halem.HALEM_time(
+        start[::-1], stop[::-1], t_late, 5, Roadmap_dry, draft=2
+    )
+    assert time_l[-1] < np.inf
+    loading = Roadmap_dry.find_loading(1, 2)
+    assert loading.lighter
+    assert loading.edge_weights[(0, 1)] is None
+    assert loading.edge_weights[(1, 3)] is not None
+
+    result = halem.HALEM_time(
+        start[::-1], stop[::-1], t_late, 5, Roadmap_dry, draft=2, return_result=True,
+    )
+    np.testing.assert_array_equal(result.time, time_l)
+    assert np.isfinite(result.cost[-1])
+
+    with pytest.raises(ValueError):
+        halem.HALEM_time(
+            start[::-1],
+            stop[::-1],
+            t_late,
+            5,
+            Roadmap_dry,
+            draft=2,
+            heuristic="landmarks",
+        )
+
+    # The lighter loading skips the connectivity index, the last arc of the route
+    # departs after node 3 has fallen dry
+    t_dry = datetime.datetime.fromtimestamp(Roadmap_dry.t[49] + 10)
+    t_dry = t_dry.strftime("%d/%m/%Y %H:%M:%S")
+    with pytest.raises(Calc_path.No_route_found):
+        halem.HALEM_time(start[::-1], stop[::-1], t_dry, 5, Roadmap_dry, draft=4)
+    routes = halem.HALEM_batch(
+        [start[::-1]],
+        [stop[::-1]],
+        t_dry,
+        5,
+        Roadmap_dry,
+        Roadmap_dry.weight_time,
+        processes=1,
+        draft=4,
+    )
+    assert list(routes) == [None]
+
+    Roadmap_load = pickle.loads(pickle.dumps(Roadmap_dry))
+    assert "loadings" not in Roadmap_load.__dict__
+    path_load, time_load, _ = halem.HALEM_time(
+        start[::-1], stop[::-1], t_late, 5, Roadmap_load, draft=2
+    )
+    np.testing.assert_array_equal(time_load, time_l)
+
+    Roadmap_cost = Mesh_maker.Graph_flow_model(
+        name_textfile_flow,
+        dx_min,
+        blend,
+        nl,
+        number_of_neighbor_layers,
+        vship,
+        flow_dry,
+        np.array([1, 5]),
+        WVPI,
+        compute_cost=Mesh_maker.Sailing_cost(week_rate=1_400_000),
+        ukc=0,
+    )
+    clear_output()
+    loading = Roadmap_cost.find_loading(1, 5, 0)
+    for arc, euros in Roadmap_cost.weight_cost[1].weights.items():
+        np.testing.assert_array_equal(loading.weight_cost[arc], euros)
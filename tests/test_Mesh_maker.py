@@ -7,6 +7,7 @@ import numpy as np
 from scipy.spatial import Delaunay
 from scipy.signal import argrelextrema
 from IPython.display import clear_output
+import pickle
 
 
 class flow_class:
@@ -309,6 +310,15 @@ def test_Graph_flow_model():
     assert Roadmap.v.shape == (400, 10)
     assert Roadmap.t.shape[0] == 10
 
+    assert Roadmap.edge_length.keys() == Roadmap.edge_heading.keys()
+    for (from_node, to_node), L in Roadmap.edge_length.items():
+        nodes = Roadmap.nodes[[from_node, to_node]]
+        np.testing.assert_allclose(L, Functions.haversine(nodes[0], nodes[1]))
+        np.testing.assert_allclose(
+            Roadmap.edge_heading[(from_node, to_node)],
+            np.arctan2(nodes[1, 0] - nodes[0, 0], nodes[1, 1] - nodes[0, 1]),
+        )
+
 
 def test_Graph_flow_model_with_indices():
     nodes_index = np.loadtxt("tests/Data/idx.csv", dtype=int)
@@ -392,3 +402,275 @@ def test_percentageprinter():
 
     f = flow_class()
     Q = Mesh_maker.node_reduction(f, (0, 0), 1, 0)
+
+
+def test_Time_axis():
+    find_k_time = Calc_path.Has_route.find_k_time
+    find_k_repeat = Calc_path.Has_route.find_k_repeat
+    uniform = np.arange(0, 100) * 1800 + 1558077464.0
+    irregular = np.cumsum(np.random.RandomState(1).randint(1, 5, 60)) * 900.0
+    times = np.concatenate(
+        (
+            np.linspace(1558077464.0 - 5000, 1558077464.0 + 200000, 397),
+            uniform + 900,
+            [np.inf],
+        )
+    )
+
+    for t in (uniform, irregular):
+        time_axis = Mesh_maker.Time_axis(t)
+        assert time_axis.uniform == (t is uniform)
+        for T in np.concatenate((times, t + 450, [t[0] - 1, t[-1] + 1])):
+            assert time_axis.find_k(T) == find_k_time(Calc_path.Has_route, T, t)
+
+        np.testing.assert_array_equal(
+            time_axis.find_k_array(times), [time_axis.find_k(T) for T in times]
+        )
+
+        time_axis = Mesh_maker.Time_axis(t, repeat=True)
+        for T in times:
+            assert time_axis.find_k(T) == find_k_repeat(Calc_path.Has_route, T, t)
+        np.testing.assert_array_equal(
+            time_axis.find_k_array(times), [time_axis.find_k(T) for T in times]
+        )
+
+
+def test_Node_index():
+    find_startstop = Calc_path.Has_route.find_startstop
+    x, y = np.meshgrid(np.arange(0, 1, 0.1), np.arange(0, 1, 0.1))
+    nodes = np.transpose((y.ravel(), x.ravel()))
+    points = np.concatenate(
+        (
+            np.random.RandomState(1).uniform(-0.2, 1.2, (300, 2)),
+            nodes + 0.05,
+            nodes[:3] + (0.05, 0),
+            [(0.45, 0.35)],
+        )
+    )
+
+    node_index = Mesh_maker.Node_index(nodes)
+    idx = node_index.find_nodes(points)
+    for point, i in zip(points, idx):
+        assert i == find_startstop(Calc_path.Has_route, point, nodes)
+    assert node_index.find_nodes(points[0]) == idx[0]
+
+    node_index = Mesh_maker.Node_index(nodes, number_of_candidates=2)
+    np.testing.assert_array_equal(node_index.find_nodes(points), idx)
+
+
+def test_prune_edges():
+    class flow_class:
+        def __init__(self, name="maaktnietuit"):
+            self.t = np.arange(0, 10) + 1558077464
+            self.nodes = np.array([(0, 0), (0, 0.001), (0.001, 0.001), (0, 0.003)])
+            self.tria = Delaunay(self.nodes)
+            self.WD = np.ones((len(self.t), len(self.nodes))) * 100
+            self.WD[:, 2] = 3
+            self.u = np.zeros((len(self.t), len(self.nodes)))
+            self.v = np.zeros((len(self.t), len(self.nodes)))
+
+    arguments = (
+        "maaktnietuit",
+        0.0000001,
+        0,
+        (1, 1),
+        1,
+        np.array([[3, 4], [4, 5]]),
+        flow_class,
+        np.array([1, 5]),
+        np.array([5000, 7000]),
+    )
+    Roadmap = Mesh_maker.Graph_flow_model(*arguments, ukc=0)
+    Roadmap_full = Mesh_maker.Graph_flow_model(*arguments, ukc=0, prune_edges=False)
+
+    assert Roadmap.pruned[0] == {"edges": 0, "states": 0}
+    assert Roadmap.pruned[1]["edges"] > 0
+    assert Roadmap.pruned[1]["states"] == 2
+    for vv in range(2):
+        for edge, W in Roadmap_full.weight_time[vv].weights.items():
+            if np.isinf(W).all():
+                assert edge not in Roadmap.weight_time[vv].weights
+                assert edge not in Roadmap.weight_co2[vv].weights
+                assert edge[1] not in Roadmap.weight_time[vv].edges.get(edge[0], [])
+            else:
+                np.testing.assert_array_equal(Roadmap.weight_time[vv].weights[edge], W)
+    assert (2, 0) not in Roadmap.weight_time[1].edges
+    assert (2, 0) in Roadmap.graph.edges
+
+
+def test_squat_table():
+    class flow_class:
+        def __init__(self, name="maaktnietuit"):
+            self.t = np.arange(0, 10) + 1558077464
+            self.nodes = np.array([(0, 0), (0, 0.001), (0.001, 0.001), (0, 0.003)])
+            self.tria = Delaunay(self.nodes)
+            self.WD = np.ones((len(self.t), len(self.nodes))) * 12
+            self.WD[:, 2] = np.linspace(6, 9, len(self.t))
+            self.u = np.ones((len(self.t), len(self.nodes))) * 0.5
+            self.v = np.zeros((len(self.t), len(self.nodes)))
+
+    arguments = (
+        "maaktnietuit",
+        0.0000001,
+        0,
+        (1, 1),
+        1,
+        np.array([[3, 4], [4, 5]]),
+        flow_class,
+        np.array([4, 5]),
+        np.array([5000, 7000]),
+    )
+    Roadmap = Mesh_maker.Graph_flow_model(*arguments, ukc=0.5)
+    Roadmap_table = Mesh_maker.Graph_flow_model(*arguments, ukc=0.5, squat_table=1000)
+
+    assert Roadmap.find_squat_table(Roadmap.vship[0], 4, 5000) == None
+    table = Roadmap_table.find_squat_table(Roadmap.vship[0], 4, 5000)
+    assert table is Roadmap_table.find_squat_table(Roadmap.vship[0], 4, 5000)
+    assert table.depths[-1] == 12
+    for vv in range(2):
+        weights = Roadmap.weight_time[vv].weights
+        assert weights.keys() == Roadmap_table.weight_time[vv].weights.keys()
+        for edge, W in weights.items():
+            np.testing.assert_allclose(
+                Roadmap_table.weight_time[vv].weights[edge], W, rtol=1e-3
+            )
+
+
+def test_Navigability_mask():
+    WD = np.array(
+        [[5, 1, 1, 5, 5, 1, 5, 5, 5, 1, 1], [1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 5]]
+    )
+    mask = Mesh_maker.Navigability_mask(WD, 2)
+
+    np.testing.assert_array_equal(np.array(mask), WD < 2)
+    np.testing.assert_array_equal(mask[0], WD[0] < 2)
+    np.testing.assert_array_equal(mask[[1, 0]], WD[[1, 0]] < 2)
+    np.testing.assert_array_equal(mask[0, 3:6], WD[0, 3:6] < 2)
+    assert mask[1, -1] == False
+    assert mask.bits.nbytes < WD.size
+    assert len(mask) == 2
+
+    assert mask.next_navigable(0, 0) == 0
+    assert mask.next_navigable(0, 1) == 3
+    assert mask.next_navigable(0, 9) == None
+    assert mask.next_navigable(0, 9, repeat=True) == 0
+    assert mask.next_navigable(1, 0) == 10
+    assert mask.navigable_windows(0) == [(0, 1), (3, 5), (6, 9)]
+    assert mask.navigable_windows(1) == [(10, 11)]
+
+
+def test_vessel_class_masks():
+    class flow_class:
+        def __init__(self, name="maaktnietuit"):
+            self.t = np.arange(0, 10) + 1558077464
+            self.nodes = np.array([(0, 0), (0, 0.001), (0.001, 0.001), (0, 0.003)])
+            self.tria = Delaunay(self.nodes)
+            self.WD = np.ones((len(self.t), len(self.nodes))) * 100
+            self.WD[:, 2] = np.linspace(2, 8, len(self.t))
+            self.u = np.zeros((len(self.t), len(self.nodes)))
+            self.v = np.zeros((len(self.t), len(self.nodes)))
+
+    Roadmap = Mesh_maker.Graph_flow_model(
+        "maaktnietuit",
+        0.0000001,
+        0,
+        (1, 1),
+        1,
+        np.array([[3, 4], [4, 5]]),
+        flow_class,
+        np.array([1, 5]),
+        np.array([5000, 7000]),
+        ukc=0,
+    )
+
+    assert Roadmap.mask is Roadmap.masks[1]
+    for vv, draft in enumerate(Roadmap.WD_min):
+        np.testing.assert_array_equal(
+            np.array(Roadmap.masks[vv]), Roadmap.WD < draft + Roadmap.ukc
+        )
+    assert np.array(Roadmap.masks[0]).sum() < np.array(Roadmap.masks[1]).sum()
+
+
+def test_update_depths():
+    def flow_class_depth(depth):
+        class flow_class:
+            def __init__(self, name="maaktnietuit"):
+                self.t = np.arange(0, 10) + 1558077464
+                self.nodes = np.array(
+                    [(0, 0), (0, 0.001), (0.001, 0.001), (0, 0.003), (0.002, 0.003)]
+                )
+                self.tria = Delaunay(self.nodes)
+                self.WD = np.ones((len(self.t), len(self.nodes))) * 100
+                self.WD[:, 2] = depth
+                self.u = np.ones((len(self.t), len(self.nodes))) * 0.3
+                self.v = np.zeros((len(self.t), len(self.nodes)))
+
+        return flow_class
+
+    arguments = (
+        "maaktnietuit",
+        0.0000001,
+        0,
+        (1, 1),
+        1,
+        np.array([[3, 4], [4, 5]]),
+    )
+    classes = (np.array([1, 5]), np.array([5000, 7000]))
+    Roadmap_deep = Mesh_maker.Graph_flow_model(
+        *arguments, flow_class_depth(100), *classes, ukc=0
+    )
+    Roadmap_shallow = Mesh_maker.Graph_flow_model(
+        *arguments, flow_class_depth(3), *classes, ukc=0
+    )
+
+    def assert_same_weights(Roadmap, Roadmap_built):
+        assert set(Roadmap.graph.weights) == set(Roadmap_built.graph.weights)
+        for name in ("weight_time", "weight_space", "weight_cost", "weight_co2"):
+            for graph, graph_built in zip(
+                getattr(Roadmap, name), getattr(Roadmap_built, name)
+            ):
+                assert graph.weights.keys() == graph_built.weights.keys()
+                for arc, W in graph_built.weights.items():
+                    np.testing.assert_array_equal(graph.weights[arc], W)
+                for state, to_states in graph_built.edges.items():
+                    assert sorted(graph.edges[state]) == sorted(to_states)
+        np.testing.assert_array_equal(
+            np.array(Roadmap.mask), np.array(Roadmap_built.mask)
+        )
+
+    n_t = len(Roadmap_deep.t)
+    edges = Roadmap_deep.update_depths([2], np.full((1, n_t), 3.0))
+    assert all(2 in edge for edge in edges)
+    assert Roadmap_deep.version == 1
+    assert Roadmap_deep.landmarks == None
+    assert_same_weights(Roadmap_deep, Roadmap_shallow)
+
+    Roadmap_shallow.update_depths(np.array([2]), np.full((1, n_t), 100.0))
+    assert_same_weights(
+        Roadmap_shallow,
+        Mesh_maker.Graph_flow_model(*arguments, flow_class_depth(100), *classes, ukc=0),
+    )
+
+    Roadmap_squat = Mesh_maker.Graph_flow_model(
+        *arguments, flow_class_depth(3), *classes, ukc=0, squat_table=50
+    )
+    Roadmap_squat.update_depths([2], np.full((1, n_t), 150.0))
+    assert_same_weights(
+        Roadmap_squat,
+        Mesh_maker.Graph_flow_model(
+            *arguments, flow_class_depth(150), *classes, ukc=0, squat_table=50
+        ),
+    )
+
+    compute_cost = Mesh_maker.Sailing_cost(week_rate=1_400_000)
+    Roadmap_cost = Mesh_maker.Graph_flow_model(
+        *arguments, flow_class_depth(100), *classes, compute_cost, ukc=0
+    )
+    Roadmap_cost.update_depths([2], np.full((1, n_t), 3.0))
+    assert_same_weights(
+        Roadmap_cost,
+        Mesh_maker.Graph_flow_model(
+            *arguments, flow_class_depth(3), *classes, compute_cost, ukc=0
+        ),
+    )
+    pickle.loads(pickle.dumps(Roadmap_cost))
@@ -191,3 +191,105 @@ def test_inbetweenpoints():
     IB = Functions.inbetweenpoints(5, 18, 3, tria)
 
     np.testing.assert_array_equal(IB, np.array([5, 18, 7, 11, 12, 16, 17]))
+
+
+def test_haversine_array():
+    coords = np.array([coord_a(), coord_b(), (1, 1), (0, 3)])
+    dist = Functions.haversine_array(coords, coord_a())
+
+    for i in range(len(coords)):
+        assert abs(dist[i] - Functions.haversine(coords[i], coord_a())) < 1e-6
+
+
+def test_heading_array():
+    coords = np.array([(0, 1), (1, 0), (1, 1), (-1, 0)])
+    heading = Functions.heading_array(coord_a(), coords)
+
+    np.testing.assert_allclose(heading, [0, np.pi / 2, np.pi / 4, -np.pi / 2])
+    for coord, alpha in zip(coords, heading):
+        assert Functions.heading_array(coord_a(), coord) == alpha
+
+
+def test_Squat():
+    h = np.array([1, 2.5, 4, 6, 10, 20, 100])
+    V_max = np.array([2, 4, 6])
+    T, LWL, WWL, ukc, WVPI = 2, 80, 10, 0.5, 2000
+
+    V = Functions.Squat(h[:, None], T, V_max, LWL, WWL, ukc, WVPI)
+    assert V.shape == (len(h), len(V_max))
+    assert (V[h < T + ukc] == 0).all()
+    assert (V[h > T + ukc] > 0).all()
+    for j in range(len(V_max)):
+        V_j = Functions.Squat(h, T, V_max[j], LWL, WWL, ukc, WVPI)
+        np.testing.assert_array_equal(V[:, j], V_j)
+        for i in range(len(h)):
+            V_i = Functions.Squat(h[i : i + 1], T, V_max[j], LWL, WWL, ukc, WVPI)
+            assert V_i[0] == V_j[i]
+
+
+def test_Squat_table():
+    V_max = np.array([2, 4, 6])
+    T, LWL, WWL, ukc, WVPI = 2, 80, 10, 0.5, 2000
+    depths = np.linspace(0, 50, 501)
+    table = Functions.Squat_table(depths, T, V_max, LWL, WWL, ukc, WVPI)
+
+    V = Functions.Squat(depths[:, None], T, V_max, LWL, WWL, ukc, WVPI)
+    np.testing.assert_array_equal(table(depths), V)
+    np.testing.assert_array_equal(table(depths, 4), V[:, 1])
+    np.testing.assert_array_equal(table(np.array([100.0])), V[-1:])
+
+    h = np.array([[3.05, 7.33], [12.71, 45.5]])
+    V_h = Functions.Squat(h[..., None], T, V_max, LWL, WWL, ukc, WVPI)
+    assert table(h).shape == (2, 2, 3)
+    np.testing.assert_allclose(table(h), V_h, rtol=1e-3)
+
+
+def test_costfunction_series():
+    WD_min = 1
+    edge = (0, 1)
+    WVPI = 1
+    flow_3 = flow(3)
+    flow_3.WD[1, :2] = 1.5
+    V_max = np.array([2, 4, 5])
+
+    t, space, navigable = Functions.costfunction_series(
+        edge, V_max, WD_min, flow_3, WVPI, 1, flow_3.tria
+    )
+    assert t.shape == space.shape == navigable.shape == (4, len(V_max))
+    assert not navigable[:2].any()
+    assert navigable[2:].all()
+    assert np.isinf(t[:2]).all() and np.isinf(space[:2]).all()
+    for j in range(len(V_max)):
+        t_j = Functions.costfunction_timeseries(
+            edge, V_max[j], WD_min, flow_3, WVPI, 1, flow_3.tria
+        )
+        space_j = Functions.costfunction_spaceseries(
+            edge, V_max[j], WD_min, flow_3, WVPI, 1, flow_3.tria
+        )
+        np.testing.assert_array_equal(t[:, j], t_j)
+        np.testing.assert_array_equal(space[:, j], space_j)
+    np.testing.assert_array_equal(space[2:], Functions.haversine(coord_a(), coord_b()))
+
+
+def test_flow_aggregates():
+    flow_3 = flow(3)
+    flow_3.u[1] = 1
+    flow_3.WD[1, 2] = 4
+    edge = (0, 1)
+
+    u_w, v_w, WD_W = Functions.flow_aggregates(edge, flow_3, 1, flow_3.tria)
+    np.testing.assert_array_equal(u_w, (flow_3.u[0] + flow_3.u[1]) / 2)
+    np.testing.assert_array_equal(v_w, 0)
+    np.testing.assert_array_equal(WD_W, np.minimum(flow_3.WD[0], flow_3.WD[1]))
+    for a, b in zip(
+        Functions.flow_aggregates(edge[::-1], flow_3, 1, flow_3.tria), (u_w, v_w, WD_W),
+    ):
+        np.testing.assert_array_equal(a, b)
+
+    for e in (edge, edge[::-1]):
+        t = Functions.costfunction_series(e, 4, 1, flow_3, 1, 1, flow_3.tria)
+        t_a = Functions.costfunction_series(
+            e, 4, 1, flow_3, 1, 1, flow_3.tria, aggregates=(u_w, v_w, WD_W)
+        )
+        for a, b in zip(t, t_a):
+            np.testing.assert_array_equal(a, b)